@@ -0,0 +1,54 @@
+import time
+from collections import namedtuple
+
+Incumbent = namedtuple('Incumbent', ['schedule', 'fitness', 'elapsed', 'evaluations'])
+
+
+class Budget:
+    # Wall-clock and fitness evaluation limits shared by the anytime solvers; with neither
+    # limit set a solver runs its usual number of iterations or generations
+    def __init__(self, time_limit=None, max_evaluations=None):
+        self.time_limit = time_limit
+        self.max_evaluations = max_evaluations
+        self.start = time.perf_counter()
+        self.evaluations = 0
+
+    def spend(self, evaluations):
+        self.evaluations += evaluations
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def expired(self, iteration, default_iterations):
+        if self.time_limit is None and self.max_evaluations is None:
+            return iteration >= default_iterations
+        if self.time_limit is not None and self.elapsed() >= self.time_limit:
+            return True
+        return self.max_evaluations is not None and self.evaluations >= self.max_evaluations
+
+    def progress(self, iteration, default_iterations):
+        # Share of the budget spent, from 0 to 1, by whichever limit is closest to running out
+        if self.time_limit is None and self.max_evaluations is None:
+            return min(1.0, iteration / default_iterations)
+        spent = 0.0
+        if self.time_limit is not None:
+            spent = max(spent, self.elapsed() / self.time_limit)
+        if self.max_evaluations is not None:
+            spent = max(spent, self.evaluations / self.max_evaluations)
+        return min(1.0, spent)
+
+
+def incumbents(solver, time_limit=None, max_evaluations=None):
+    # Yields an Incumbent every time an ExamScheduleILS or GeneticAlgorithm improves its best schedule
+    budget = Budget(time_limit, max_evaluations)
+    for schedule, fitness in solver.anytime(budget):
+        yield Incumbent(schedule, fitness, budget.elapsed(), budget.evaluations)
+
+
+def solve(solver, time_limit=None, max_evaluations=None, callback=None):
+    # Runs until the budget is spent and returns the last Incumbent, calling callback with each one
+    best = None
+    for best in incumbents(solver, time_limit, max_evaluations):
+        if callback is not None:
+            callback(best)
+    return best
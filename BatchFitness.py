@@ -0,0 +1,86 @@
+import numpy as np
+
+
+class BatchEvaluator:
+    # Scores a whole population at once. Individuals are rows of a 2-D integer array
+    # (individuals x courses) holding slot indexes, with -1 for an unscheduled course.
+    # The result matches calculate_schedule_fitness of the solver it was built for.
+    CHUNK_ELEMENTS = 1 << 22  # bounds the size of the (individuals x conflict pairs) work arrays
+
+    def __init__(self, slots, graph, hard_penalty, light_penalty, start_time_factor=0, shared_exam_conflicts=False):
+        self.hard_penalty = hard_penalty
+        self.light_penalty = light_penalty
+        self.start_time_factor = start_time_factor
+        # GeneticAlgorithm lets only the first course holding an exam share it without a conflict
+        self.shared_exam_conflicts = shared_exam_conflicts
+
+        self.start = np.asarray(slots.start, dtype=np.int64)
+        self.end = np.asarray(slots.end, dtype=np.int64)
+        self.day = np.asarray(slots.day, dtype=np.int64)
+        self.capacity = np.asarray(slots.capacity, dtype=np.int64)
+        self.self_overlap = self.end > self.start
+
+        # Course pairs as a directed edge list sorted by the owning course
+        self.num_courses = len(graph)
+        degrees = np.array([len(n) for n in graph.neighbours], dtype=np.int64)
+        self.edge_course = np.repeat(np.arange(self.num_courses), degrees)
+        self.edge_other = np.array([n for ns in graph.neighbours for n in ns], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(degrees)[:-1]))
+        self.has_edges = degrees > 0
+        self.edge_offsets = offsets[self.has_edges]
+        self.sizes = np.array([course.num_of_students for course in graph.courses], dtype=np.int64)
+        self.has_groups = np.array([graph.conflicting(i, i) for i in range(self.num_courses)], dtype=bool)
+
+    def evaluate(self, population):
+        population = np.asarray(population, dtype=np.int64).reshape(-1, self.num_courses)
+        rows = max(1, self.CHUNK_ELEMENTS // max(1, len(self.edge_course)))
+        fitness = np.zeros(len(population), dtype=np.int64)
+        for i in range(0, len(population), rows):
+            fitness[i:i + rows] = self.evaluate_chunk(population[i:i + rows])
+        return fitness
+
+    def per_course(self, edges):
+        result = np.zeros((edges.shape[0], self.num_courses), dtype=bool)
+        if len(self.edge_offsets):
+            result[:, self.has_edges] = np.logical_or.reduceat(edges, self.edge_offsets, axis=1)
+        return result
+
+    def evaluate_chunk(self, population):
+        scheduled = population >= 0
+        slot = np.where(scheduled, population, 0)
+
+        own = slot[:, self.edge_course]
+        other = slot[:, self.edge_other]
+        both = scheduled[:, self.edge_course] & scheduled[:, self.edge_other]
+        different = own != other
+
+        # Slot relations are worked out per conflict pair, a slot x slot matrix does not fit large instances
+        own_day = self.day[own]
+        other_day = self.day[other]
+        same_day = own_day == other_day
+        overlap = same_day & (self.end[other] > self.start[own]) & (self.end[own] > self.start[other])
+        conflict = self.per_course(both & different & overlap)
+        previous_day = self.per_course(both & (own_day - other_day == 1))
+        apart = self.per_course(both & different & same_day & ~overlap)
+
+        if self.shared_exam_conflicts:
+            # Only the first course (in course order) holding a slot may share it
+            individuals, num_slots = population.shape[0], len(self.capacity)
+            first = np.full((individuals, num_slots), self.num_courses, dtype=np.int64)
+            rows, courses = np.nonzero(scheduled)
+            np.minimum.at(first, (rows, slot[rows, courses]), courses)
+
+            holder = np.take_along_axis(first, slot, axis=1)
+            courses = np.arange(self.num_courses)
+            shares_self = self.self_overlap[slot] & self.has_groups & (holder != courses)
+            other_holder = holder[:, self.edge_course]
+            shares_other = self.per_course(both & ~different & self.self_overlap[own] & (self.edge_other != other_holder))
+            conflict |= scheduled & (shares_self | shares_other)
+
+        fitness = self.start_time_factor * self.start[slot]
+        fitness += self.hard_penalty * (self.capacity[slot] < self.sizes)
+        fitness += self.hard_penalty * conflict
+        fitness += self.light_penalty * previous_day
+        fitness += self.light_penalty * 2 * apart
+        fitness = np.where(scheduled, fitness, self.hard_penalty - self.light_penalty)
+        return fitness.sum(axis=1)
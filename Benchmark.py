@@ -0,0 +1,310 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from importlib.util import find_spec
+
+import Anytime
+import InstanceGenerator
+import InstanceLoader
+from IteratedLocalSearch import ExamScheduleILS
+from GeneticAlgoritm import GeneticAlgorithm
+from TabuSearch import TabuSearch
+from Decomposition import Decomposition
+from ScheduleEvaluator import ScheduleEvaluator
+from SlotTable import SlotTable
+from ConflictGraph import get_conflict_graph
+
+INSTANCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Instance')
+SOLVERS = ('ils', 'ga', 'tabu', 'annealing', 'gurobi') if find_spec('gurobipy') is not None else ('ils', 'ga', 'tabu', 'annealing')
+TRIALS = 3
+SEED = 0
+GUROBI_TIME_LIMIT = 60  # seconds per Gurobi run
+TIME_TOLERANCE = 0.25  # a run more than 25% slower than the baseline is a regression
+MEMORY_TOLERANCE = 0.25
+FIELDS = ('solver', 'instance', 'trial', 'seed', 'wall_time', 'evaluations', 'peak_memory', 'fitness', 'hard_violations')
+SCALING_SIZES = (1000, 2000, 5000, 10000, 20000)  # courses of the generated instances
+SCALING_SOLVERS = ('ils', 'ga', 'tabu', 'annealing')
+SCALING_TIME_LIMIT = 10  # seconds per solver and size, the initial schedule included
+SCALING_FIELDS = ('solver', 'courses', 'exams', 'seed', 'setup_time', 'first_schedule_time', 'wall_time', 'evaluations',
+                  'peak_memory', 'fitness', 'hard_violations')
+
+
+def instance_names():
+    return [os.path.basename(path)[:-len('.pickle')] for path in sorted(glob.glob(os.path.join(INSTANCE_DIR, '*.pickle')))]
+
+
+def load_instance(name):
+    data = InstanceLoader.load_instance(os.path.join(INSTANCE_DIR, name + '.pickle'))
+    return data['exams'], data['courses'], data['students']
+
+
+def run_ils(exams, courses, students):
+    ils = ExamScheduleILS(exams, courses, students)
+    stats = ils.enable_instrumentation()
+    return ils.find_schedule(), stats.evaluations
+
+
+def run_ga(exams, courses, students):
+    ga = GeneticAlgorithm(exams, courses, students)
+    stats = ga.enable_instrumentation()
+    return ga.run(), stats.evaluations
+
+
+def run_tabu(exams, courses, students, mode='tabu'):
+    TabuSearch.MODE = mode
+    search = TabuSearch(exams, courses, students)
+    stats = search.enable_instrumentation()
+    return search.find_schedule(), stats.evaluations
+
+
+def run_annealing(exams, courses, students):
+    return run_tabu(exams, courses, students, 'annealing')
+
+
+def run_decomposed(exams, courses, students):
+    Decomposition.SOLVER = 'ils'
+    Decomposition.WORKERS = 1  # the trial measures one process
+    return Decomposition(exams, courses, students).find_schedule(), None
+
+
+def run_gurobi(exams, courses, students):
+    from Gurobi import solve_exam_scheduling
+    solutions = [0]
+
+    def on_solution(schedule, objective, runtime):
+        solutions[0] += 1
+
+    schedule = solve_exam_scheduling(courses, exams, students, time_limit=GUROBI_TIME_LIMIT, threads=1, on_solution=on_solution)
+    if schedule is not None:
+        schedule = {course: schedule.get(course) for course in courses}
+    return schedule, solutions[0]
+
+
+RUNNERS = {
+    'ils': run_ils,
+    'ga': run_ga,
+    'tabu': run_tabu,
+    'annealing': run_annealing,
+    'decomposed': run_decomposed,
+    'gurobi': run_gurobi,
+}
+
+
+def score(solver, exams, courses, schedule):
+    # Fitness under the solver's own penalty rules, and the number of courses breaking a hard constraint
+    if schedule is None:
+        return None, len(courses)
+    algorithm = GeneticAlgorithm if solver == 'ga' else ExamScheduleILS
+    evaluator = ScheduleEvaluator(SlotTable(exams), get_conflict_graph(courses), algorithm.HARD_CONSTRAINT_PENALTY, algorithm.LIGHT_CONSTRAINT_PENALTY,
+                                  algorithm.START_TIME_FACTOR, shared_exam_conflicts=solver == 'ga')
+    fitness = evaluator.load(schedule)
+    violations = 0
+    for c, s in enumerate(evaluator.assignment):
+        if s < 0 or evaluator.slots.capacity[s] < evaluator.sizes[c] or evaluator.has_conflict(c):
+            violations += 1
+    return fitness, violations
+
+
+def run_trial(solver, name, trial, seed, trace_memory=True):
+    exams, courses, students = load_instance(name)
+    random.seed(seed)
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        schedule, evaluations = RUNNERS[solver](exams, courses, students)
+        wall_time = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    fitness, violations = score(solver, exams, courses, schedule)
+    return {
+        'solver': solver,
+        'instance': name,
+        'trial': trial,
+        'seed': seed,
+        'wall_time': wall_time,
+        'evaluations': evaluations,
+        'peak_memory': peak_memory,
+        'fitness': fitness,
+        'hard_violations': violations,
+    }
+
+
+def run_benchmark(solvers=SOLVERS, instances=None, trials=TRIALS, seed=SEED, trace_memory=True):
+    results = []
+    for name in instances or instance_names():
+        for solver in solvers:
+            for trial in range(trials):
+                result = run_trial(solver, name, trial, seed + trial, trace_memory)
+                print(f"{solver:7} {name:9} trial {trial}: fitness {result['fitness']}, "
+                      f"hard violations {result['hard_violations']}, {result['wall_time']:.2f} s")
+                results.append(result)
+    return results
+
+
+def make_solver(solver, exams, courses, students):
+    if solver == 'ils':
+        return ExamScheduleILS(exams, courses, students)
+    if solver == 'ga':
+        return GeneticAlgorithm(exams, courses, students)
+    TabuSearch.MODE = solver
+    return TabuSearch(exams, courses, students)
+
+
+def run_scaling_trial(solver, num_courses, seed, time_limit=SCALING_TIME_LIMIT, trace_memory=True):
+    # Setup (conflict graph and solver tables), the first schedule and the whole run are timed separately;
+    # every solver gets a freshly generated instance so nothing built by another one is reused
+    data = InstanceGenerator.generate(num_courses, seed=seed)
+    exams, courses, students = data['exams'], data['courses'], data['students']
+    random.seed(seed)
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        if solver == 'gurobi':
+            setup_time = first_schedule_time = None
+            schedule, evaluations = run_gurobi(exams, courses, students)
+        else:
+            algorithm = make_solver(solver, exams, courses, students)
+            setup_time = time.perf_counter() - start
+            first_schedule_time = None
+            best = None
+            for best in Anytime.incumbents(algorithm, time_limit=time_limit):
+                if first_schedule_time is None:
+                    first_schedule_time = time.perf_counter() - start
+            schedule, evaluations = best.schedule, best.evaluations
+        wall_time = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    fitness, violations = score(solver, exams, courses, schedule)
+    return {
+        'solver': solver,
+        'courses': num_courses,
+        'exams': len(exams),
+        'seed': seed,
+        'setup_time': setup_time,
+        'first_schedule_time': first_schedule_time,
+        'wall_time': wall_time,
+        'evaluations': evaluations,
+        'peak_memory': peak_memory,
+        'fitness': fitness,
+        'hard_violations': violations,
+    }
+
+
+def run_scaling(solvers=SCALING_SOLVERS, sizes=SCALING_SIZES, seed=SEED, time_limit=SCALING_TIME_LIMIT, trace_memory=True):
+    results = []
+    for num_courses in sizes:
+        for solver in solvers:
+            result = run_scaling_trial(solver, num_courses, seed, time_limit, trace_memory)
+            memory = f"{result['peak_memory'] / 2 ** 20:.0f} MiB" if result['peak_memory'] is not None else '-'
+            first = f"{result['first_schedule_time']:.2f} s" if result['first_schedule_time'] is not None else '-'
+            print(f"{solver:9} {num_courses:6} courses: first schedule {first}, {result['wall_time']:.2f} s, "
+                  f"{memory}, fitness {result['fitness']}, hard violations {result['hard_violations']}")
+            results.append(result)
+    return results
+
+
+def summarize(results):
+    groups = {}
+    for result in results:
+        groups.setdefault((result['solver'], result['instance']), []).append(result)
+
+    summary = {}
+    for key, group in groups.items():
+        def mean(field):
+            values = [result[field] for result in group if result[field] is not None]
+            return sum(values) / len(values) if values else None
+        summary[key] = {field: mean(field) for field in ('wall_time', 'evaluations', 'peak_memory', 'fitness', 'hard_violations')}
+    return summary
+
+
+def compare(results, baseline):
+    # Fitness and hard violations are seeded and must not get worse; time and memory may drift within a tolerance
+    regressions = []
+    current = summarize(results)
+    reference = summarize(baseline)
+    for key, now in current.items():
+        before = reference.get(key)
+        if before is None:
+            continue
+        for field in ('fitness', 'hard_violations'):
+            if now[field] is not None and before[field] is not None and now[field] > before[field]:
+                regressions.append((key, field, before[field], now[field]))
+        for field, tolerance in (('wall_time', TIME_TOLERANCE), ('peak_memory', MEMORY_TOLERANCE)):
+            if now[field] is not None and before[field] is not None and now[field] > before[field] * (1 + tolerance):
+                regressions.append((key, field, before[field], now[field]))
+    return regressions
+
+
+def write_json(path, results):
+    with open(path, 'w') as file:
+        json.dump({'python': sys.version.split()[0], 'results': results}, file, indent=2)
+
+
+def read_json(path):
+    with open(path) as file:
+        return json.load(file)['results']
+
+
+def write_csv(path, results, fields=FIELDS):
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the exam scheduling solvers on the instances in Instance/')
+    parser.add_argument('--solvers', nargs='+', choices=RUNNERS, default=list(SOLVERS))
+    parser.add_argument('--instances', nargs='+', choices=instance_names())
+    parser.add_argument('--trials', type=int, default=TRIALS)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc, which slows the solvers down')
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--csv')
+    parser.add_argument('--baseline', help='results of an earlier run to check for regressions')
+    parser.add_argument('--scaling', type=int, nargs='*', metavar='COURSES',
+                        help=f"time and memory against instance size on generated instances instead (default sizes: {' '.join(map(str, SCALING_SIZES))})")
+    parser.add_argument('--time-limit', type=float, default=SCALING_TIME_LIMIT, help='seconds per solver and size in --scaling')
+    args = parser.parse_args(argv)
+
+    if args.scaling is not None:
+        solvers = args.solvers if args.solvers != list(SOLVERS) else list(SCALING_SOLVERS)
+        results = run_scaling(solvers, args.scaling or SCALING_SIZES, args.seed, args.time_limit, not args.no_memory)
+        write_json(args.output, results)
+        if args.csv:
+            write_csv(args.csv, results, SCALING_FIELDS)
+        return 0
+
+    results = run_benchmark(args.solvers, args.instances, args.trials, args.seed, not args.no_memory)
+    write_json(args.output, results)
+    if args.csv:
+        write_csv(args.csv, results)
+
+    if args.baseline:
+        regressions = compare(results, read_json(args.baseline))
+        for (solver, name), field, before, now in regressions:
+            print(f"REGRESSION {solver} {name} {field}: {before:.6g} -> {now:.6g}")
+        if regressions:
+            return 1
+        print("No regressions against the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
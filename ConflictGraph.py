@@ -0,0 +1,104 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+class ConflictGraph:
+    # Courses that share at least one group of students, built once per course list
+    def __init__(self, courses, adjacency=None):
+        self.courses = courses
+        self.index = {}
+        for i, course in enumerate(courses):
+            self.index.setdefault(id(course), i)
+
+        if adjacency is not None:  # (neighbours, offsets, has_groups) arrays, e.g. from the instance cache
+            self.from_adjacency(*adjacency)
+            return
+
+        members = {}  # id(group) -> ids of courses taken by that group
+        for i, course in enumerate(courses):
+            for group in course.groups_of_students:
+                members.setdefault(id(group), []).append(i)
+
+        self.neighbours = []
+        self.neighbour_courses = []
+        self.matrix = []  # row i is a bitset of the courses sharing a group with course i
+        for i, course in enumerate(courses):
+            ids = set()
+            for group in course.groups_of_students:
+                ids.update(members[id(group)])
+            row = 0
+            for j in ids:
+                row |= 1 << j
+            self.matrix.append(row)
+            ids.discard(i)
+            ids = sorted(ids)
+            self.neighbours.append(ids)
+            self.neighbour_courses.append([courses[j] for j in ids])
+
+    def from_adjacency(self, neighbours, offsets, has_groups):
+        # Row i is neighbours[offsets[i]:offsets[i + 1]]; all bits are set in one packed array
+        # and each row converted to an int, instead of OR-ing the bitsets bit by bit
+        n = len(self.courses)
+        values = neighbours.tolist()
+        bounds = offsets.tolist()
+        self.neighbours = [values[bounds[i]:bounds[i + 1]] for i in range(n)]
+        self.neighbour_courses = [list(map(self.courses.__getitem__, ids)) for ids in self.neighbours]
+
+        own = np.flatnonzero(has_groups)
+        rows = np.concatenate((np.repeat(np.arange(n), np.diff(offsets)), own))
+        columns = np.concatenate((neighbours, own))
+        packed = np.zeros((n, (n + 7) // 8), dtype=np.uint8)
+        np.bitwise_or.at(packed, (rows, columns >> 3), (1 << (columns & 7)).astype(np.uint8))
+        self.matrix = [int.from_bytes(row.tobytes(), 'little') for row in packed]
+
+    def __len__(self):
+        return len(self.courses)
+
+    def course_id(self, course):
+        return self.index[id(course)]
+
+    def neighbours_of(self, course):
+        return self.neighbour_courses[self.index[id(course)]]
+
+    def conflicting(self, i, j):
+        return bool(self.matrix[i] >> j & 1)
+
+    def together(self, course1, course2):
+        return bool(self.matrix[self.index[id(course1)]] >> self.index[id(course2)] & 1)
+
+    def degree(self, i):
+        return len(self.neighbours[i])
+
+
+MAX_CACHED_GRAPHS = 8  # least recently used graphs are dropped beyond this many course lists
+_graphs = OrderedDict()  # id(courses) -> (membership, graph)
+
+
+def membership(courses):
+    # Changes when a course of the list is replaced or a group of students takes up or drops a course
+    return hash((tuple(map(id, courses)),
+                 frozenset((id(course), id(group)) for course in courses for group in course.groups_of_students)))
+
+
+def get_conflict_graph(courses, adjacency=None):
+    key = membership(courses)
+    cached = _graphs.get(id(courses))
+    if cached is None or cached[0] != key or cached[1].courses is not courses:
+        cached = key, ConflictGraph(courses, adjacency)
+        _graphs[id(courses)] = cached
+        if len(_graphs) > MAX_CACHED_GRAPHS:
+            _graphs.popitem(last=False)
+    _graphs.move_to_end(id(courses))
+    return cached[1]
+
+
+def refresh_conflict_graph(courses):
+    # Rebuilds the cached graph even when the membership looks unchanged
+    _graphs.pop(id(courses), None)
+    return get_conflict_graph(courses)
+
+
+def forget_conflict_graph(courses):
+    # Drops the cached graph of a course list that will not be solved again
+    _graphs.pop(id(courses), None)
@@ -0,0 +1,120 @@
+import heapq
+import random
+from array import array
+
+import numpy as np
+
+
+class Construction:
+    # DSATUR-style construction: the course with the fewest usable slots left is placed next
+    # (ties go to the course with more neighbours, then the larger one), into the usable slot
+    # with the fewest soft penalties and the tightest capacity.
+    #
+    # Scheduling a course only touches its neighbours: every one of them counts, per slot, the
+    # scheduled neighbours overlapping that slot and, per day, the scheduled neighbours on that day.
+    def __init__(self, slots, graph, exclusive_slots=False):
+        self.slots = slots
+        self.graph = graph
+        # GeneticAlgorithm lets only the first course holding an exam share it without a conflict
+        self.exclusive_slots = exclusive_slots
+
+        self.capacity = np.array(slots.capacity, dtype=np.int64)
+        days = sorted(set(slots.day))
+        position = {day: i for i, day in enumerate(days)}
+        self.num_days = len(days)
+        self.day_index = np.array([position[day] for day in slots.day], dtype=np.int64)
+        # -1 points at an extra, always empty, day
+        self.previous_day = np.array([position.get(day - 1, -1) for day in days], dtype=np.int64)
+        self.next_day = np.array([position.get(day + 1, -1) for day in days], dtype=np.int64)
+
+        by_day = {}
+        for s in range(len(slots)):
+            by_day.setdefault(slots.day[s], []).append(s)
+        self.overlapping = [[t for t in by_day[slots.day[s]] if slots.overlap(s, t)] for s in range(len(slots))]
+
+        self.sizes = [course.num_of_students for course in graph.courses]
+        self.has_groups = [graph.conflicting(i, i) for i in range(len(graph))]
+        self.degrees = [graph.degree(i) for i in range(len(graph))]
+        sorted_capacity = np.sort(self.capacity)
+        self.fitting = [len(slots) - int(np.searchsorted(sorted_capacity, size)) for size in self.sizes]
+
+    def construct(self, rng=None):
+        # Returns the slot of every course, -1 where no slot is big enough and free of overlaps.
+        # With an rng, ties between courses and between slots are broken at random.
+        num_courses = len(self.graph)
+        assignment = array('i', [-1] * num_courses)
+        blocked = [{} for _ in range(num_courses)]  # slot -> scheduled neighbours overlapping it
+        neighbour_days = [{} for _ in range(num_courses)]  # day -> scheduled neighbours on it
+        available = list(self.fitting)
+        placed = [False] * num_courses
+        used = np.zeros(len(self.slots), dtype=bool)
+        used_by_groups = np.zeros(len(self.slots), dtype=bool)
+
+        tie = [rng.random() for _ in range(num_courses)] if rng is not None else range(num_courses)
+        heap = [(available[c], -self.degrees[c], -self.sizes[c], tie[c], c) for c in range(num_courses)]
+        heapq.heapify(heap)
+
+        while heap:
+            count, _, _, _, c = heapq.heappop(heap)
+            if placed[c] or count != available[c]:
+                continue  # stale entry, the course was pushed again with fewer slots
+            placed[c] = True
+
+            s = self.choose_slot(c, blocked[c], neighbour_days[c], used, used_by_groups, rng)
+            if s < 0:
+                continue
+            assignment[c] = s
+            used[s] = True
+            if self.has_groups[c]:
+                used_by_groups[s] = True
+
+            day = int(self.day_index[s])
+            for n in self.graph.neighbours[c]:
+                if placed[n]:
+                    continue
+                neighbour_days[n][day] = neighbour_days[n].get(day, 0) + 1
+                slots_blocked = blocked[n]
+                size = self.sizes[n]
+                changed = False
+                for t in self.overlapping[s]:
+                    k = slots_blocked.get(t, 0)
+                    slots_blocked[t] = k + 1
+                    if k == 0 and self.capacity[t] >= size:
+                        available[n] -= 1
+                        changed = True
+                if changed:
+                    heapq.heappush(heap, (available[n], -self.degrees[n], -self.sizes[n], tie[n], n))
+
+        return assignment
+
+    def choose_slot(self, c, blocked, neighbour_days, used, used_by_groups, rng):
+        usable = self.capacity >= self.sizes[c]
+        if blocked:
+            usable[list(blocked)] = False
+        if self.exclusive_slots:
+            # A course with groups must hold its exam alone; other courses may share among themselves
+            usable &= ~(used if self.has_groups[c] else used_by_groups)
+
+        busy = np.zeros(self.num_days + 1, dtype=bool)
+        for day in neighbour_days:
+            busy[day] = True
+        # Same day, but apart, costs twice a neighbour on the day before or after
+        day_penalty = 2 * busy[:-1] + busy[self.previous_day] + busy[self.next_day]
+
+        key = day_penalty[self.day_index] * (int(self.capacity.max()) + 1) + (self.capacity - self.sizes[c])
+        key[~usable] = np.iinfo(np.int64).max
+        best = key.min()
+        if best == np.iinfo(np.int64).max:
+            return -1
+        choices = np.flatnonzero(key == best)
+        return int(choices[0] if rng is None else choices[rng.randrange(len(choices))])
+
+    def best_of(self, starts, fitness, rng=None):
+        # Without an rng the first start is the deterministic order and the others draw from random
+        best, best_fitness = None, None
+        for i in range(starts):
+            assignment = self.construct(rng if rng is not None else (random if i else None))
+            value = fitness(assignment)
+            if best is None or value < best_fitness:
+                best, best_fitness = assignment, value
+        return best
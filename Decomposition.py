@@ -0,0 +1,136 @@
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ConflictGraph import get_conflict_graph
+from IteratedLocalSearch import ExamScheduleILS
+from GeneticAlgoritm import GeneticAlgorithm
+from TabuSearch import TabuSearch
+
+
+class Decomposition:
+    # Courses only interact through shared groups of students, so every connected component of
+    # the conflict graph can be scheduled on its own and the schedules merged afterwards.
+    #
+    # GeneticAlgorithm lets only the first course holding an exam share it, which couples courses
+    # of different components; its parts get disjoint shares of the exams instead.
+    SOLVER = 'ils'  # 'ils', 'ga', 'tabu' or 'gurobi'
+    WORKERS = os.cpu_count() or 1
+    MIN_PART_SIZE = 20  # components smaller than this are solved together as one part, a solver run each costs too much
+    GUROBI_TIME_LIMIT = None  # seconds per part
+    SEED = 0
+    EXCLUSIVE_SOLVERS = ('ga',)
+
+    def __init__(self, exams, courses, students):
+        self.exams = exams
+        self.courses = courses
+        self.students = students
+        self.graph = get_conflict_graph(courses)
+        self.part_statistics = []
+
+    def components(self):
+        # Connected components of the conflict graph, each a sorted list of course indices
+        seen = [False] * len(self.graph)
+        components = []
+        for start in range(len(self.graph)):
+            if seen[start]:
+                continue
+            seen[start] = True
+            stack = [start]
+            component = []
+            while stack:
+                c = stack.pop()
+                component.append(c)
+                for n in self.graph.neighbours[c]:
+                    if not seen[n]:
+                        seen[n] = True
+                        stack.append(n)
+            components.append(sorted(component))
+        return components
+
+    def partition(self):
+        # Large components stay alone, the small ones share one part
+        parts = []
+        small = []
+        for component in sorted(self.components(), key=len, reverse=True):
+            if len(component) >= Decomposition.MIN_PART_SIZE:
+                parts.append(component)
+            else:
+                small.extend(component)
+        if small:
+            parts.append(sorted(small))
+        return parts
+
+    def share_exams(self, parts):
+        # Deals the exams out from the largest capacity down, always to the part with the fewest exams
+        # per course, so every part gets exams of every size
+        shares = [[] for _ in parts]
+        order = sorted(range(len(self.exams)), key=lambda s: self.exams[s].capacity, reverse=True)
+        for s in order:
+            part = min(range(len(parts)), key=lambda p: len(shares[p]) / len(parts[p]))
+            shares[part].append(s)
+        return [sorted(share) for share in shares]
+
+    def find_schedule(self):
+        parts = self.partition()
+        if Decomposition.SOLVER in Decomposition.EXCLUSIVE_SOLVERS:
+            shares = self.share_exams(parts)
+        else:
+            shares = [None] * len(parts)
+        tasks = [(Decomposition.SOLVER, part, share, Decomposition.SEED + i) for i, (part, share) in enumerate(zip(parts, shares))]
+
+        workers = min(Decomposition.WORKERS, len(tasks))
+        if workers > 1:
+            # Forked workers inherit the instance; only course and exam indices cross the process boundary
+            with ProcessPoolExecutor(workers, initializer=init_part_worker,
+                                     initargs=(self.exams, self.courses, self.students)) as pool:
+                results = list(pool.map(solve_part_in_worker, tasks))
+        else:
+            results = [solve_part(self.exams, self.courses, self.students, *task) for task in tasks]
+
+        schedule = dict.fromkeys(self.courses)
+        self.part_statistics = []
+        for part, (slots, seconds) in zip(parts, results):
+            for c, s in zip(part, slots):
+                schedule[self.courses[c]] = self.exams[s] if s >= 0 else None
+            self.part_statistics.append({'courses': len(part), 'seconds': seconds})
+        return schedule
+
+
+def solve_part(exams, courses, students, solver, part, share, seed):
+    # Returns the exam index of every course in the part, -1 where it is unscheduled, and the time taken
+    start = time.perf_counter()
+    part_courses = [courses[c] for c in part]
+    part_exams = exams if share is None else [exams[s] for s in share]
+    groups = {id(group) for course in part_courses for group in course.groups_of_students}
+    part_students = [group for group in students if id(group) in groups]
+
+    random.seed(seed)
+    if solver == 'ils':
+        schedule = ExamScheduleILS(part_exams, part_courses, part_students).find_schedule()
+    elif solver == 'ga':
+        schedule = GeneticAlgorithm(part_exams, part_courses, part_students).run()
+    elif solver == 'tabu':
+        schedule = TabuSearch(part_exams, part_courses, part_students).find_schedule()
+    elif solver == 'gurobi':
+        from Gurobi import solve_exam_scheduling
+        schedule = solve_exam_scheduling(part_courses, part_exams, part_students, time_limit=Decomposition.GUROBI_TIME_LIMIT, threads=1) or {}
+    else:
+        raise ValueError(f"Unknown solver: {solver}")
+
+    index = {id(exam): s for s, exam in enumerate(exams)}
+    slots = [-1 if schedule.get(course) is None else index[id(schedule[course])] for course in part_courses]
+    return slots, time.perf_counter() - start
+
+
+worker_instance = None
+
+
+def init_part_worker(exams, courses, students):
+    global worker_instance
+    worker_instance = (exams, courses, students)
+
+
+def solve_part_in_worker(task):
+    return solve_part(*worker_instance, *task)
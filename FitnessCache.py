@@ -0,0 +1,58 @@
+import hashlib
+from collections import OrderedDict
+
+
+class FitnessCache:
+    # Fitness values keyed by a 128-bit hash of the compact slot assignment, evicted least recently used first
+    ENTRY_BYTES = 200  # rough size of one entry (key, value and ordering node), used for byte limits
+
+    def __init__(self, max_entries=100000, max_bytes=None, penalties=None):
+        self.max_entries = max_entries
+        if max_bytes is not None:
+            limit = max(1, max_bytes // FitnessCache.ENTRY_BYTES)
+            self.max_entries = limit if max_entries is None else min(max_entries, limit)
+        self.penalties = penalties
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, assignment):
+        return hashlib.blake2b(assignment, digest_size=16).digest()
+
+    def get(self, key):
+        fitness = self.entries.get(key)
+        if fitness is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return fitness
+
+    def put(self, key, fitness):
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        if self.max_entries is not None and len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def validate(self, penalties):
+        # Values scored under other penalty constants are worthless, drop them all
+        if penalties == self.penalties:
+            return True
+        self.entries.clear()
+        self.penalties = penalties
+        return False
+
+    def clear(self):
+        self.entries.clear()
+
+    def statistics(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
@@ -1,52 +1,35 @@
 import datetime
 from datetime import date, timedelta
 import random
-import copy
-
-class Exam:
-    def __init__(self, date, start_time, duration, capacity):
-        self.date = date
-        self.start_time = start_time
-        self.duration = duration
-        self.capacity = capacity
-
-    def __str__(self):
-        return f"The exam is scheduled for {self.date} starting at {self.start_time} and lasts {self.duration} hours. This exam can accommodate {self.capacity} students."
-
-    
-class Course:
-    def __init__(self, name):
-        self.name = name
-        self.groups_of_students = set()  # Groups of students taking this course
-        self.num_of_students = 0
-
-    def add_students(self, students_group, number_of_students):
-        self.groups_of_students.add(students_group) 
-        self.num_of_students += number_of_students
-
-    def __str__(self):
-        return f"Course: {self.name}"
-
-
-class Students:
-    def __init__(self, name, number_of_students):
-        self.name = name
-        self.num_of_students = number_of_students
-        self.courses = []
-
-    def add_course(self, course):
-        self.courses.append(course)
-        course.add_students(self, self.num_of_students)
-
-    def __str__(self):
-        return f"{self.name} - There are {self.num_of_students} students"
-    
+from array import array
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from SlotTable import SlotTable, parse_time, parse_duration
+from Model import Exam, Course, Students
+from ConflictGraph import get_conflict_graph
+from BatchFitness import BatchEvaluator
+from FitnessCache import FitnessCache
+from Instrumentation import Stats, Trace, instrument, one
+from Construction import Construction
+from Anytime import Budget
 
 class GeneticAlgorithm:
     POPULATION_SIZE = 100
     NUMBER_OF_GENERATIONS = 50
     CROSSOVER_RATE = 0.8
     MUTATION_RATE = 0.2
+    WORKERS = 1  # processes used to evaluate the population, 1 evaluates serially
+    FITNESS_CACHE_SIZE = 100000
+    CONSTRUCTION_STARTS = 1  # more than 1 keeps the best of several randomized constructions
+
+    ADAPTIVE = True  # adapt the mutation rate and partially restart while the best stagnates
+    STAGNATION_WINDOW = 3  # generations without improvement before the mutation rate changes
+    MUTATION_RATE_FACTOR = 0.5  # the rate is multiplied by this once per window; mutation also hits the elite, so lower helps
+    MIN_MUTATION_RATE = 0.025
+    MAX_MUTATION_RATE = 0.8
+    DIVERSITY_THRESHOLD = 0.5  # share of distinct chromosomes below which the population is restarted in part
+    RESTART_FRACTION = 0.2  # share of the population replaced by randomized constructions
+    INSTRUMENTED_METHODS = ('find_initial_schedule', 'initialize_population', 'selection', 'crossover', 'mutation')
 
     HARD_CONSTRAINT_PENALTY = 100000
     LIGHT_CONSTRAINT_PENALTY = 100
@@ -56,40 +39,154 @@ class GeneticAlgorithm:
         self.exams = exams
         self.courses = courses
         self.students = students
+        self.slots = SlotTable(exams)
+        self.graph = get_conflict_graph(courses)
+        self.fitness_cache = FitnessCache(GeneticAlgorithm.FITNESS_CACHE_SIZE)
+        self.refresh_penalties()
+        self.typecode = 'h' if len(exams) <= 0x7fff else 'i'
+        self.dtype = np.int16 if self.typecode == 'h' else np.int32
+        self.pool = None
+        self.evaluations = 0  # individuals actually scored, cache hits excluded
+        self.construction = Construction(self.slots, self.graph, exclusive_slots=True)
+        self.stats = None
+        self.trace = None
+        self.mutation_rate = GeneticAlgorithm.MUTATION_RATE
+        self.adaptation_log = []
+
+    def refresh_penalties(self):
+        penalties = (GeneticAlgorithm.HARD_CONSTRAINT_PENALTY, GeneticAlgorithm.LIGHT_CONSTRAINT_PENALTY, GeneticAlgorithm.START_TIME_FACTOR)
+        if not self.fitness_cache.validate(penalties):
+            self.batch_evaluator = BatchEvaluator(self.slots, self.graph, *penalties, shared_exam_conflicts=True)
+
+    def enable_instrumentation(self, trace_path=None):
+        self.stats = Stats()
+        for name in GeneticAlgorithm.INSTRUMENTED_METHODS:
+            instrument(self, name, self.stats)
+        instrument(self, 'calculate_schedule_fitness', self.stats, one)
+        instrument(self, 'population_fitness', self.stats, len)
+        self.trace = Trace(trace_path, self.stats) if trace_path is not None else None
+        return self.stats
 
     def run(self):
+        best_schedule = None
+        for best_schedule, _ in self.anytime(Budget()):
+            pass
+        return best_schedule
+
+    def anytime(self, budget=None):
+        # Yields (schedule, fitness) whenever a generation's best individual beats every earlier one
+        budget = budget if budget is not None else Budget()
+        self.refresh_penalties()
+        if GeneticAlgorithm.WORKERS > 1:
+            # Workers receive the evaluator once, at pool start; afterwards only chromosome bytes are sent
+            with ProcessPoolExecutor(GeneticAlgorithm.WORKERS, initializer=init_evaluation_worker,
+                                     initargs=(self.batch_evaluator, self.dtype)) as self.pool:
+                try:
+                    yield from self.evolve(budget)
+                finally:
+                    self.pool = None
+        else:
+            yield from self.evolve(budget)
+
+    def evolve(self, budget):
+        # Every run starts from the configured mutation rate, whatever an earlier run adapted it to
+        self.mutation_rate = GeneticAlgorithm.MUTATION_RATE
+        self.adaptation_log = []
+        evaluations = self.evaluations
         population = self.initialize_population()
+        best_fitness = None
+        generation = 0
+        stale = 0  # generations since the best individual improved
+
+        while True:
+            fitness = self.population_fitness(population)  # scored here, taken from the cache by selection
+            budget.spend(self.evaluations - evaluations)
+            evaluations = self.evaluations
+
+            best = min(range(len(fitness)), key=fitness.__getitem__)
+            if best_fitness is None or fitness[best] < best_fitness:
+                best_fitness = fitness[best]
+                stale = 0
+                yield self.to_schedule(population[best]), best_fitness
+            else:
+                stale += 1
+
+            if self.trace is not None:
+                self.trace.event(generation=generation, fitness=fitness[best], mean_fitness=sum(fitness) / len(fitness))
+            if budget.expired(generation, GeneticAlgorithm.NUMBER_OF_GENERATIONS):
+                break
+            if GeneticAlgorithm.ADAPTIVE:
+                population = self.adapt(population, fitness, generation, stale)
 
-        for generation in range(GeneticAlgorithm.NUMBER_OF_GENERATIONS):
             population = self.selection(population)
             population = self.crossover(population)
             self.mutation(population)
+            generation += 1
+
+    def adapt(self, population, fitness, generation, stale):
+        # Every STAGNATION_WINDOW generations without improvement the mutation rate changes and a population
+        # that lost its diversity has its worst members replaced; an improvement resets the rate
+        if stale == 0:
+            if self.mutation_rate != GeneticAlgorithm.MUTATION_RATE:
+                self.mutation_rate = GeneticAlgorithm.MUTATION_RATE
+                self.log_adaptation(generation=generation, action='reset_mutation_rate', mutation_rate=self.mutation_rate)
+            return population
+        if stale % GeneticAlgorithm.STAGNATION_WINDOW:
+            return population
+
+        rate = self.mutation_rate * GeneticAlgorithm.MUTATION_RATE_FACTOR
+        self.mutation_rate = min(GeneticAlgorithm.MAX_MUTATION_RATE, max(GeneticAlgorithm.MIN_MUTATION_RATE, rate))
+        diversity = self.diversity(population)
+        self.log_adaptation(generation=generation, action='mutation_rate', diversity=diversity, mutation_rate=self.mutation_rate)
+
+        if diversity < GeneticAlgorithm.DIVERSITY_THRESHOLD:
+            count = max(1, int(len(population) * GeneticAlgorithm.RESTART_FRACTION))
+            worst = sorted(range(len(population)), key=fitness.__getitem__)[-count:]
+            population = population.copy()
+            # One randomized construction per restart, the newcomers are single course variations of it
+            restart = array(self.typecode, self.construction.construct(random))
+            for i in worst:
+                population[i] = self.generate_candidate(restart)
+            self.log_adaptation(generation=generation, action='partial_restart', diversity=diversity, replaced=count)
+        return population
 
-        best_schedule = self.get_best_schedule(population)
-        return best_schedule
+    def diversity(self, population):
+        # Share of distinct chromosomes, 1 when no two individuals are equal
+        return len({chromosome.tobytes() for chromosome in population}) / len(population)
+
+    def log_adaptation(self, **decision):
+        self.adaptation_log.append(decision)
+        if self.trace is not None:
+            self.trace.event(**decision)
+
+    def to_chromosome(self, schedule):
+        slot_of = self.slots.slot_of
+        return array(self.typecode, (-1 if schedule.get(course) is None else slot_of(schedule[course]) for course in self.courses))
+
+    def to_schedule(self, chromosome):
+        return {course: (self.exams[slot] if slot >= 0 else None) for course, slot in zip(self.courses, chromosome)}
 
     def initialize_population(self):
         population = []
-        schedule = self.find_initial_schedule()
+        chromosome = self.to_chromosome(self.find_initial_schedule())
 
         for _ in range(GeneticAlgorithm.POPULATION_SIZE):
-            member = self.generate_candidate(schedule)
+            member = self.generate_candidate(chromosome)
             population.append(member)
 
         return population
 
-    def generate_candidate(self, current_schedule):
-        candidate_schedule = copy.deepcopy(current_schedule)
+    def generate_candidate(self, current_chromosome):
+        candidate = current_chromosome[:]
 
-        course = random.choice(list(candidate_schedule.keys()))
-        exam = random.choice(self.exams)
-        
-        candidate_schedule[course] = exam
+        course = random.randrange(len(candidate))
+        candidate[course] = random.randrange(len(self.exams))
 
-        return candidate_schedule
+        return candidate
 
     def selection(self, population):
-        sorted_population = sorted(population, key=lambda x: self.calculate_schedule_fitness(x))
+        fitness = self.population_fitness(population)
+        sorted_population = [population[i] for i in sorted(range(len(population)), key=lambda i: fitness[i])]
         elite_size = int(GeneticAlgorithm.POPULATION_SIZE * 0.2)  # Select the top 20% as elite individuals
         elite = sorted_population[:elite_size]
         
@@ -109,54 +206,86 @@ class GeneticAlgorithm:
         return new_population
 
     def perform_crossover(self, parent1, parent2):  # simple one-point crossover
-
-        offspring = {}
-
         crossover_point = random.randint(1, len(self.courses))
-        parent1_courses = list(parent1.keys())
-        parent2_courses = list(parent2.keys())
-
-        for i in range(len(self.courses)):
-            course = self.courses[i]
-
-            if i < crossover_point:
-                offspring[course] = parent1[parent1_courses[i]]
-            else:
-                offspring[course] = parent2[parent2_courses[i]]
-
-        return offspring
+        return parent1[:crossover_point] + parent2[crossover_point:]
 
     def mutation(self, population):
-        for schedule in population:
-            if random.random() < GeneticAlgorithm.MUTATION_RATE:
-                self.perform_mutation(schedule)
+        for chromosome in population:
+            if random.random() < self.mutation_rate:
+                self.perform_mutation(chromosome)
 
 
-    def perform_mutation(self, schedule):
-        courses = list(schedule.keys())
-
-        mutation_courses = random.sample(courses, k=random.randint(1, len(courses)))
+    def perform_mutation(self, chromosome):
+        mutation_courses = random.sample(range(len(chromosome)), k=random.randint(1, len(chromosome)))
 
         for course in mutation_courses:
-            if random.random() < GeneticAlgorithm.MUTATION_RATE:
-                exam = random.choice(self.exams)
-                schedule[course] = exam
+            if random.random() < self.mutation_rate:
+                chromosome[course] = random.randrange(len(self.exams))
 
 
     def get_best_schedule(self, population):
         best_fitness = float('inf')
-        best_schedule = None
+        best_chromosome = None
 
-        for schedule in population:
-            fitness = self.calculate_schedule_fitness(schedule)
+        for chromosome, fitness in zip(population, self.population_fitness(population)):
             if fitness < best_fitness:
                 best_fitness = fitness
-                best_schedule = schedule
+                best_chromosome = chromosome
 
-        return best_schedule
+        return best_chromosome
+
+    def population_fitness(self, population):
+        self.refresh_penalties()
+        cache = self.fitness_cache
+        fitness = [None] * len(population)
+        pending = {}  # key -> positions of the individuals that still need scoring
+
+        for i, chromosome in enumerate(population):
+            key = cache.key(chromosome)
+            if key in pending:
+                pending[key].append(i)
+                cache.hits += 1
+                continue
+            cached = cache.get(key)
+            if cached is None:
+                pending[key] = [i]
+            else:
+                fitness[i] = cached
+
+        if pending:
+            keys = list(pending)
+            scores = self.evaluate_chromosomes([population[pending[key][0]] for key in keys])
+            self.evaluations += len(keys)
+            for key, score in zip(keys, scores):
+                cache.put(key, score)
+                for i in pending[key]:
+                    fitness[i] = score
+
+        return fitness
+
+    def evaluate_chromosomes(self, chromosomes):
+        if self.pool is not None:
+            chunk_size = -(-len(chromosomes) // GeneticAlgorithm.WORKERS)
+            chunks = [b''.join(chromosomes[i:i + chunk_size]) for i in range(0, len(chromosomes), chunk_size)]
+            return [fitness for chunk in self.pool.map(evaluate_in_worker, chunks) for fitness in chunk]
+        assignments = np.frombuffer(b''.join(chromosomes), dtype=self.dtype).reshape(len(chromosomes), len(self.courses))
+        return self.batch_evaluator.evaluate(assignments).tolist()
     
     def calculate_schedule_fitness(self, schedule):
+        self.refresh_penalties()
+        if len(schedule) != len(self.courses):
+            return self.score_schedule(schedule)
+
+        key = self.fitness_cache.key(self.to_chromosome(schedule))
+        fitness = self.fitness_cache.get(key)
+        if fitness is None:
+            fitness = self.score_schedule(schedule)
+            self.fitness_cache.put(key, fitness)
+        return fitness
+
+    def score_schedule(self, schedule):
         fitness = 0
+        first_courses = self.first_courses(schedule)
                 
         for course, exam in schedule.items():
             if exam is None:
@@ -168,7 +297,7 @@ class GeneticAlgorithm:
             if exam.capacity < course.num_of_students:
                 fitness += GeneticAlgorithm.HARD_CONSTRAINT_PENALTY
                         
-            if self.conflicts_exist(schedule, exam, course):
+            if self.conflicts_exist(schedule, exam, course, first_courses):
                 fitness += GeneticAlgorithm.HARD_CONSTRAINT_PENALTY
 
             if self.has_consecutive_days(schedule, exam, course):
@@ -190,6 +319,17 @@ class GeneticAlgorithm:
 
     
     def find_initial_schedule(self):
+        self.refresh_penalties()
+        if GeneticAlgorithm.CONSTRUCTION_STARTS > 1:
+            assignment = self.construction.best_of(GeneticAlgorithm.CONSTRUCTION_STARTS, self.assignment_fitness)
+        else:
+            assignment = self.construction.construct()
+        return self.to_schedule(assignment)
+
+    def assignment_fitness(self, assignment):
+        return int(self.batch_evaluator.evaluate(np.array([assignment], dtype=self.dtype))[0])
+
+    def first_fit_schedule(self):
         schedule = {}
 
         for course in self.courses:
@@ -225,86 +365,127 @@ class GeneticAlgorithm:
         return True
     
     def no_conflicts(self, exam, course, schedule):
-        for c, e in schedule.items():
-            if e is not None and self.together(course, c) and (e.date == exam.date or self.are_days_consecutive(e.date, exam.date)):
+        slots = self.slots
+        slot = slots.slot_of(exam)
+        for c in self.graph.neighbours_of(course):
+            e = schedule.get(c)
+            if e is None:
+                continue
+            other_slot = slots.slot_of(e)
+            if slots.same_day(other_slot, slot) or slots.consecutive(other_slot, slot):
                 return False
         return True
     
     def together(self, course1, course2):
-        return bool(course1.groups_of_students & course2.groups_of_students)
+        return self.graph.together(course1, course2)
     
     def are_days_consecutive(self, date1, date2):
         delta = datetime.timedelta(days=1)
         return (date2 - date1) == delta
     
     def on_consecutive_days(self, exam, course, schedule):
-        for c, e in schedule.items():
-            if e is not None and self.together(course, c) and e.date != exam.date:
-                if self.are_days_consecutive(e.date, exam.date) and self.no_conflicts(exam, course, schedule):
+        slots = self.slots
+        slot = slots.slot_of(exam)
+        for c in self.graph.neighbours_of(course):
+            e = schedule.get(c)
+            if e is not None:
+                other_slot = slots.slot_of(e)
+                if not slots.same_day(other_slot, slot) and slots.consecutive(other_slot, slot) and self.no_conflicts(exam, course, schedule):
                     return True
         return False
     
     def can_schedule_exam(self, exam, course, schedule):
-        for given_course, scheduled_exam in schedule.items():
-            if scheduled_exam is not None and self.together(course, given_course) and scheduled_exam.date == exam.date:
-                if not (self.is_exam_finished(exam, scheduled_exam) or self.is_exam_finished(scheduled_exam, exam)):
-                    return False
+        slots = self.slots
+        slot = slots.slot_of(exam)
+        for given_course in self.graph.neighbours_of(course):
+            scheduled_exam = schedule.get(given_course)
+            if scheduled_exam is not None and slots.overlap(slot, slots.slot_of(scheduled_exam)):
+                return False
         return True
 
     def is_exam_finished(self, exam1, exam2):
-        exam1_end_time = self.get_start_time(exam1) + self.parse_duration(exam1.duration)
-        exam2_start_time = self.get_start_time(exam2)
-        return exam1_end_time <= exam2_start_time
+        return self.slots.is_finished(self.slots.slot_of(exam1), self.slots.slot_of(exam2))
     
-    def conflicts_exist(self, schedule, exam, course):
-        first_same = True
-        for other_course, other_exam in schedule.items():
-            if other_exam is None:
-                continue
-            elif other_exam == exam and first_same:
-                first_same = False
+    def conflicts_exist(self, schedule, exam, course, first_courses=None):
+        slots = self.slots
+        slot = slots.slot_of(exam)
+        if first_courses is None:
+            first_courses = self.first_courses(schedule)
+        # The first course holding this exam is the only one allowed to share it
+        first = first_courses.get(slot)
+
+        own_exam = schedule.get(course)
+        if own_exam is not None and course is not first and self.together(course, course) and slots.overlap(slots.slot_of(own_exam), slot):
+            return True
+
+        for other_course in self.graph.neighbours_of(course):
+            other_exam = schedule.get(other_course)
+            if other_exam is None or other_course is first:
                 continue
 
-            if self.together(other_course, course) and other_exam.date == exam.date and not (self.is_exam_finished(other_exam, exam) or self.is_exam_finished(exam, other_exam)):
+            if slots.overlap(slots.slot_of(other_exam), slot):
                 return True
         return False
+
+    def first_courses(self, schedule):
+        first_courses = {}
+        slot_of = self.slots.slot_of
+        for course, exam in schedule.items():
+            if exam is not None:
+                first_courses.setdefault(slot_of(exam), course)
+        return first_courses
     
     def has_consecutive_days(self, schedule, exam, course):
-        for other_course, other_exam in schedule.items():
+        slots = self.slots
+        slot = slots.slot_of(exam)
+        for other_course in self.graph.neighbours_of(course):
+            other_exam = schedule.get(other_course)
             if other_exam is None or other_exam == exam:
                 continue
 
-            if self.together(other_course, course) and self.are_days_consecutive(other_exam.date, exam.date):
+            if slots.consecutive(slots.slot_of(other_exam), slot):
                 return True
         return False
 
     
     def same_day_different_time(self, schedule, exam, course):
-        for other_course, other_exam in schedule.items():
+        slots = self.slots
+        slot = slots.slot_of(exam)
+        for other_course in self.graph.neighbours_of(course):
+            other_exam = schedule.get(other_course)
             if other_exam is None or other_exam == exam:
                 continue
 
-            if self.together(other_course, course) and other_exam.date == exam.date and (self.is_exam_finished(other_exam, exam) or self.is_exam_finished(exam, other_exam)):
+            if slots.apart(slots.slot_of(other_exam), slot):
                 return True
 
         return False
 
     def get_start_time(self, exam):
-        return self.parse_time(exam.start_time)
+        return self.slots.start[self.slots.slot_of(exam)]
 
     def parse_time(self, time_string):
-        hours, minutes = time_string.split(":")
-        hours = int(hours) if hours else 0
-        minutes = int(minutes) if minutes else 0
-        return hours * 60 + minutes
+        return parse_time(time_string)
 
     def parse_duration(self, duration_string):
-        hours, minutes = duration_string.split("h")
-        hours = int(hours.strip()) if hours else 0
-        minutes = int(minutes.strip().replace("m", "")) if minutes else 0
-        return int(hours) * 60 + int(minutes)
+        return parse_duration(duration_string)
     
     
+worker_evaluator = None
+worker_dtype = None
+
+
+def init_evaluation_worker(batch_evaluator, dtype):
+    global worker_evaluator, worker_dtype
+    worker_evaluator = batch_evaluator
+    worker_dtype = dtype
+
+
+def evaluate_in_worker(chunk):
+    assignments = np.frombuffer(chunk, dtype=worker_dtype).reshape(-1, worker_evaluator.num_courses)
+    return worker_evaluator.evaluate(assignments).tolist()
+
+
 def print_schedule(schedule):
     if schedule:
         print("Exam Schedule:")
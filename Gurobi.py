@@ -1,84 +1,28 @@
 import gurobipy as gp
 from gurobipy import GRB
+import time
 from datetime import timedelta
-
-class Exam:
-    def __init__(self, date, start_time, duration, capacity):
-        self.date = date
-        self.start_time = start_time
-        self.duration = duration
-        self.capacity = capacity
-
-    def __str__(self):
-        return f"The exam is scheduled for {self.date} starting at {self.start_time} and lasts {self.duration} hours. This exam can accommodate {self.capacity} students."
-
-    
-class Course:
-    def __init__(self, name):
-        self.name = name
-        self.groups_of_students = set()  # Groups of students taking this course
-        self.num_of_students = 0
-
-    def add_students(self, students_group, number_of_students):
-        self.groups_of_students.add(students_group) 
-        self.num_of_students += number_of_students
-
-    def __str__(self):
-        return f"Course: {self.name}"
-
-
-class Students:
-    def __init__(self, name, number_of_students):
-        self.name = name
-        self.num_of_students = number_of_students
-        self.courses = []
-
-    def add_course(self, course):
-        self.courses.append(course)
-        course.add_students(self, self.num_of_students)
-
-    def __str__(self):
-        return f"{self.name} - There are {self.num_of_students} students"
-
+from SlotTable import SlotTable, parse_time, parse_duration
+from Model import Exam, Course, Students
+from ConflictGraph import get_conflict_graph
+from Instrumentation import Stats, Trace
 
 EXAMS_ON_SAME_DAY_PENALTY = 200
 EXAMS_ON_CONCECUTIVE_DAYS_PENALTY = 100
 
 
-def parse_duration(duration_string):
-    hours, minutes = duration_string.split("h")
-    hours = int(hours.strip()) if hours else 0
-    minutes = int(minutes.strip().replace("m", "")) if minutes else 0
-    return int(hours) * 60 + int(minutes)
-
-def parse_time(time_string):
-    hours, minutes = time_string.split(":")
-    hours = int(hours) if hours else 0
-    minutes = int(minutes) if minutes else 0
-    return hours * 60 + minutes
+def is_exam_finished(table, i, j):
+    return table.is_finished(i, j)
 
-def get_start_time(slot):
-    return parse_time(slot.start_time)
 
-def is_exam_finished(slot1, exam2):
-            exam1_end_time = get_start_time(slot1) + parse_duration(slot1.duration)
-            exam2_start_time = get_start_time(exam2)
-            return exam1_end_time <= exam2_start_time
+def slots_overlap(table, i, j):
+    return table.overlap(i, j)
 
-
-def slots_overlap(slot1, slot2):
-            if slot1.date == slot2.date:
-                if not (is_exam_finished(slot1, slot2) or is_exam_finished(slot2, slot1)):
-                    return True
-            return False
-
-def same_day_conflict(course1, course2, slot1, slot2):
+def same_day_conflict(graph, table, course1, course2, i, j):
     if (
-        bool(course1.groups_of_students & course2.groups_of_students)
-        and slot1.date == slot2.date
-        and not slots_overlap(slot1, slot2)
+        graph.together(course1, course2)
+        and table.apart(i, j)
     ):
-        print("same day",course1.name, course2.name,slot1.date, slot1.start_time,slot2.date, slot2.start_time)
         return 1
     return 0
 
@@ -86,84 +30,366 @@ def are_days_consecutive(date1, date2):
     delta = timedelta(days=1)
     return (date2 - date1) == delta
 
-def consecutive_days_conflict(course1, course2, slot1, slot2):
+def consecutive_days_conflict(graph, table, course1, course2, i, j):
     if (
-        bool(course1.groups_of_students & course2.groups_of_students)
-        and slot1.date != slot2.date
-        and are_days_consecutive(slot1.date, slot2.date)
+        graph.together(course1, course2)
+        and not table.same_day(i, j)
+        and table.consecutive(i, j)
     ):
-        print("consecutive days",course1.name, course2.name,slot1.date, slot1.start_time,slot2.date, slot2.start_time)
         return 1
     return 0
 
 
-def solve_exam_scheduling(courses, slots, students):
+def slot_pairs(table):
+    # Slot pairs m < n that can carry a term: same day and apart, consecutive days, same day and overlapping
+    slots_by_day = {}
+    for s in range(len(table)):
+        slots_by_day.setdefault(table.day[s], []).append(s)
+
+    same_day, consecutive_days, overlapping = [], [], []
+    for m in range(len(table)):
+        for n in slots_by_day[table.day[m]]:
+            if n <= m:
+                continue
+            if table.overlap(m, n):
+                overlapping.append((m, n))
+            else:
+                same_day.append((m, n))
+        for n in slots_by_day.get(table.day[m] + 1, ()):
+            if n > m:
+                consecutive_days.append((m, n))
+    return same_day, consecutive_days, overlapping
+
+
+def add_variables(model, courses, slots):
+    X = {}
+
+    for course in courses:
+        for slot in slots:
+            var_name = f"X[{course.name}, {slot.date}, {slot.start_time}]"
+            X[course, slot] = model.addVar(vtype=GRB.BINARY, name=var_name)
+
+    return X
+
+
+def build_model(courses, slots):
+    model = gp.Model()
+    table = SlotTable(slots)
+    graph = get_conflict_graph(courses)
+
+    # Decision variables
+    X = add_variables(model, courses, slots)
+
+    # Only pairs of courses sharing a group and slot pairs on the same or consecutive days can add a term
+    course_pairs = [(courses[i], courses[j]) for i in range(len(courses)) for j in graph.neighbours[i] if j > i]
+    same_day, consecutive_days, overlapping = slot_pairs(table)
+
+    # Objective function
+    coefficients, first, second = [], [], []
+    for course1, course2 in course_pairs:
+        for m, n in same_day:
+            coefficients.append(EXAMS_ON_SAME_DAY_PENALTY)
+            first.append(X[course1, slots[m]])
+            second.append(X[course2, slots[n]])
+    for course1, course2 in course_pairs:
+        for m, n in consecutive_days:
+            coefficients.append(EXAMS_ON_CONCECUTIVE_DAYS_PENALTY)
+            first.append(X[course1, slots[m]])
+            second.append(X[course2, slots[n]])
+    objective = gp.QuadExpr()
+    objective.addTerms(coefficients, first, second)
+    model.setObjective(objective, sense=GRB.MINIMIZE)
+
+    # Hard constraints
+
+    # Constraint 1: Each course should be assigned to exactly one exam slot
+    model.addConstrs(gp.quicksum(X[course, slot] for slot in slots) == 1 for course in courses)
+
+    # Constraint 2: Courses sharing a common group cannot be assigned to the same exam slot
+    model.addConstrs(X[course1, slot] + X[course2, slot] <= 1 for course1, course2 in course_pairs for slot in slots)
+
+    # Constraint 3: Two courses sharing a group cannot be assigned to overlapping exam slots, whichever holds the earlier one.
+    # With both orientations the rows allow the same schedules as the clique rows of build_linear_model
+    overlapping += [(n, m) for m, n in overlapping]
+    model.addConstrs(X[course1, slots[m]] + X[course2, slots[n]] <= 1 for course1, course2 in course_pairs for m, n in overlapping)
+
+    # Constraint 4: Capacity constraint for each exam slot
+    model.addConstrs(X[course, slot] == 0 for course in courses for slot in slots if course.num_of_students > slot.capacity)
+
+    return model, X
+
+
+def build_dense_model(courses, slots):
+    # The original formulation, looping over every pair of courses and slots; kept to compare against build_model
+    model = gp.Model()
+    table = SlotTable(slots)
+    graph = get_conflict_graph(courses)
+
+    X = add_variables(model, courses, slots)
+
+    model.setObjective(
+        gp.quicksum(
+            EXAMS_ON_SAME_DAY_PENALTY * X[courses[i], slots[m]] * X[courses[j], slots[n]] * same_day_conflict(graph, table, courses[i], courses[j], m, n)
+            for i in range(len(courses))
+            for j in range(i + 1, len(courses))
+            for m in range(len(slots))
+            for n in range(m + 1, len(slots))
+        ) + gp.quicksum(
+            EXAMS_ON_CONCECUTIVE_DAYS_PENALTY * X[courses[i], slots[m]] * X[courses[j], slots[n]] * consecutive_days_conflict(graph, table, courses[i], courses[j], m, n)
+            for i in range(len(courses))
+            for j in range(i + 1, len(courses))
+            for m in range(len(slots))
+            for n in range(m + 1, len(slots))
+        ),
+        sense=GRB.MINIMIZE,
+    )
+
+    for course in courses:
+        model.addConstr(gp.quicksum(X[course, slot] for slot in slots) == 1)
+
+    for i in range(len(courses)):
+        for j in range(i + 1, len(courses)):
+            if graph.conflicting(i, j):
+                for slot in slots:
+                    model.addConstr(X[courses[i], slot] + X[courses[j], slot] <= 1)
+
+    for i in range(len(courses)):
+        for j in range(i + 1, len(courses)):
+            if graph.conflicting(i, j):
+                for m in range(len(slots)):
+                    for n in range(len(slots)):
+                        if n != m and slots_overlap(table, m, n):
+                            model.addConstr(X[courses[i], slots[m]] + X[courses[j], slots[n]] <= 1)
+
+    for course in courses:
+        for slot in slots:
+            if course.num_of_students > slot.capacity:
+                model.addConstr(X[course, slot] == 0)
+
+    return model, X
+
+
+def compare_model_builders(courses, slots):
+    start = time.perf_counter()
+    dense_model, _ = build_dense_model(courses, slots)
+    dense_model.update()
+    dense_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sparse_model, _ = build_model(courses, slots)
+    sparse_model.update()
+    sparse_time = time.perf_counter() - start
+
+    # Terms with a zero coefficient in the dense objective are not part of the model
+    dense_objective = dense_model.getObjective()
+    dense_terms = sum(1 for k in range(dense_objective.size()) if dense_objective.getCoeff(k) != 0)
+    comparison = {
+        'dense_seconds': dense_time,
+        'sparse_seconds': sparse_time,
+        'speedup': dense_time / sparse_time if sparse_time else float('inf'),
+        'variables': (dense_model.NumVars, sparse_model.NumVars),
+        'constraints': (dense_model.NumConstrs, sparse_model.NumConstrs),
+        'objective_terms': (dense_terms, sparse_model.getObjective().size()),
+    }
+    print(f"Dense build {dense_time:.2f} s, sparse build {sparse_time:.2f} s, speedup {comparison['speedup']:.1f}x")
+    return comparison
+
+
+def interval_cliques(table):
+    # Maximal sets of mutually overlapping slots: for intervals on one day, the slots running at some start time
+    slots_by_day = {}
+    for s in range(len(table)):
+        slots_by_day.setdefault(table.day[s], []).append(s)
+
+    cliques = []
+    for day in sorted(slots_by_day):
+        day_slots = slots_by_day[day]
+        active = {frozenset(s for s in day_slots if table.start[s] <= t < table.end[s])
+                  for t in {table.start[s] for s in day_slots}}
+        active.discard(frozenset())
+        maximal = [clique for clique in active if not any(clique < other for other in active)]
+        covered = set().union(*maximal)
+        maximal += [frozenset([s]) for s in day_slots if s not in covered]
+        cliques.extend(sorted(sorted(clique) for clique in maximal))
+    return cliques
+
+
+def build_linear_model(courses, slots):
+    # Linear alternative to build_model: penalties are counted per group of students and day instead of per pair
+    # of course assignments, and pairwise conflict rows become one clique row per group and overlapping slot set.
+    model = gp.Model()
+    table = SlotTable(slots)
+
+    # Decision variables
+    X = add_variables(model, courses, slots)
+
+    groups = {}  # id(group) -> (group, courses taken by the group)
+    for course in courses:
+        for group in course.groups_of_students:
+            groups.setdefault(id(group), (group, []))[1].append(course)
+    groups = list(groups.values())
+
+    slots_by_day = {}
+    for s, slot in enumerate(slots):
+        slots_by_day.setdefault(table.day[s], []).append(slot)
+    days = sorted(slots_by_day)
+
+    same_day = []
+    consecutive_days = []
+    for group, group_courses in groups:
+        has_exam = {}
+        for day in days:
+            day_slots = slots_by_day[day]
+            date = day_slots[0].date
+
+            # Every exam of the group on this day beyond the first is penalized
+            extra_exams = model.addVar(lb=0, name=f"SameDay[{group.name}, {date}]")
+            model.addConstr(extra_exams >= gp.quicksum(X[course, slot] for course in group_courses for slot in day_slots) - 1)
+            same_day.append(extra_exams)
+
+            has_exam[day] = model.addVar(vtype=GRB.BINARY, name=f"HasExam[{group.name}, {date}]")
+            model.addConstrs(has_exam[day] >= gp.quicksum(X[course, slot] for slot in day_slots) for course in group_courses)
+
+            if day - 1 in has_exam:
+                both_days = model.addVar(lb=0, name=f"ConsecutiveDays[{group.name}, {date}]")
+                model.addConstr(both_days >= has_exam[day - 1] + has_exam[day] - 1)
+                consecutive_days.append(both_days)
+
+    # Objective function
+    model.setObjective(
+        EXAMS_ON_SAME_DAY_PENALTY * gp.quicksum(same_day) + EXAMS_ON_CONCECUTIVE_DAYS_PENALTY * gp.quicksum(consecutive_days),
+        sense=GRB.MINIMIZE,
+    )
+
+    # Hard constraints
+
+    # Constraint 1: Each course should be assigned to exactly one exam slot
+    model.addConstrs(gp.quicksum(X[course, slot] for slot in slots) == 1 for course in courses)
+
+    # Constraints 2 and 3: A group has at most one exam in any set of overlapping slots
+    cliques = interval_cliques(table)
+    model.addConstrs(gp.quicksum(X[course, slots[s]] for course in group_courses for s in clique) <= 1
+                     for _, group_courses in groups for clique in cliques)
+
+    # Constraint 4: Capacity constraint for each exam slot
+    model.addConstrs(X[course, slot] == 0 for course in courses for slot in slots if course.num_of_students > slot.capacity)
+
+    return model, X
+
+
+def quadratic_objective(courses, slots, solution):
+    # Value of the original (quadratic) objective for a solved schedule, to compare formulations on equal terms
+    table = SlotTable(slots)
+    graph = get_conflict_graph(courses)
+    assigned = [table.slot_of(solution[course]) if solution.get(course) is not None else -1 for course in courses]
+
+    value = 0
+    for i in range(len(courses)):
+        for j in graph.neighbours[i]:
+            m, n = assigned[i], assigned[j]
+            if j <= i or m < 0 or n < 0 or m >= n:
+                continue
+            if table.apart(m, n):
+                value += EXAMS_ON_SAME_DAY_PENALTY
+            elif table.consecutive(m, n):
+                value += EXAMS_ON_CONCECUTIVE_DAYS_PENALTY
+    return value
+
+
+def compare_formulations(courses, slots, students):
+    results = {}
+    for formulation in FORMULATIONS:
+        start = time.perf_counter()
+        solution = solve_exam_scheduling(courses, slots, students, formulation)
+        results[formulation] = {
+            'seconds': time.perf_counter() - start,
+            'scheduled_courses': len(solution) if solution else 0,
+            'quadratic_objective': quadratic_objective(courses, slots, solution) if solution else None,
+        }
+        print(f"{formulation}: {results[formulation]['seconds']:.2f} s, objective {results[formulation]['quadratic_objective']}")
+    return results
+
+
+FORMULATIONS = {
+    'quadratic': build_model,
+    'linear': build_linear_model,
+}
+
+
+def set_initial_schedule(X, courses, slots, initial_schedule):
+    # MIP start from an ILS or GA schedule; courses it leaves unscheduled are completed by Gurobi
+    for course in courses:
+        exam = initial_schedule.get(course)
+        if exam is None:
+            continue
+        for slot in slots:
+            X[course, slot].Start = 1 if slot is exam else 0
+
+
+def solution_callback(X, on_solution):
+    keys = list(X)
+    variables = [X[key] for key in keys]
+    best = [float('inf')]
+
+    def callback(model, where):
+        if where != GRB.Callback.MIPSOL:
+            return
+        objective = model.cbGet(GRB.Callback.MIPSOL_OBJ)
+        if objective >= best[0]:
+            return
+        best[0] = objective
+        values = model.cbGetSolution(variables)
+        schedule = {course: slot for (course, slot), value in zip(keys, values) if value > 0.5}
+        on_solution(schedule, objective, model.cbGet(GRB.Callback.RUNTIME))
+
+    return callback
+
+
+def traced(trace, on_solution):
+    def callback(schedule, objective, runtime):
+        trace.event(fitness=objective, runtime=runtime)
+        if on_solution is not None:
+            on_solution(schedule, objective, runtime)
+
+    return callback
+
+
+def solve_exam_scheduling(courses, slots, students, formulation='quadratic', initial_schedule=None,
+                          time_limit=None, mip_gap=None, threads=None, on_solution=None, stats=None, trace_path=None):
+    trace = None
     try:
-        model = gp.Model()
-
-        # Decision variables
-        X = {}
-
-        for course in courses:
-            for slot in slots:
-                var_name = f"X[{course.name}, {slot.date}, {slot.start_time}]"
-                X[course, slot] = model.addVar(vtype=GRB.BINARY, name=var_name)
-
-
-        # Objective function
-        model.setObjective(
-            gp.quicksum(
-                EXAMS_ON_SAME_DAY_PENALTY * X[courses[i], slots[m]] * X[courses[j], slots[n]] * same_day_conflict(courses[i], courses[j], slots[m], slots[n])
-                for i in range(len(courses))
-                for j in range(i + 1, len(courses))
-                for m in range(len(slots))
-                for n in range(m + 1, len(slots))
-            ) + gp.quicksum(
-                EXAMS_ON_CONCECUTIVE_DAYS_PENALTY * X[courses[i], slots[m]] * X[courses[j], slots[n]] * consecutive_days_conflict(courses[i], courses[j], slots[m], slots[n])
-                for i in range(len(courses))
-                for j in range(i + 1, len(courses))
-                for m in range(len(slots))
-                for n in range(m + 1, len(slots))
-            ),
-            sense=GRB.MINIMIZE,
-        )
-
-        # Hard constraints
-
-        # Constraint 1: Each course should be assigned to exactly one exam slot
-        for course in courses:
-            model.addConstr(gp.quicksum(X[course, slot] for slot in slots) == 1)
-
-        # Constraint 2: Courses sharing a common group cannot be assigned to the same exam slot
-        for i in range(len(courses)):
-            for j in range(i + 1, len(courses)):
-                course1 = courses[i]
-                course2 = courses[j]
-                if bool(course1.groups_of_students & course2.groups_of_students):
-                    for slot in slots:
-                        model.addConstr(X[course1, slot] + X[course2, slot] <= 1)
-        
-
-        # Constraint 3: Two courses sharing a group cannot be assigned to overlapping exam slots
-        for i in range(len(courses)):
-            for j in range(i + 1, len(courses)):
-                course1 = courses[i]
-                course2 = courses[j]
-                if bool(course1.groups_of_students & course2.groups_of_students):
-                    for m in range(len(slots)):
-                        for n in range(m + 1, len(slots)):
-                            slot1 = slots[m]
-                            slot2 = slots[n]
-                            if slot1.date == slot2.date and slots_overlap(slot1, slot2):
-                                model.addConstr(X[course1, slot1] + X[course2, slot2] <= 1)
-
-        # Constraint 4: Capacity constraint for each exam slot
-        for course in courses:
-            for slot in slots:
-                if course.num_of_students > slot.capacity:
-                    model.addConstr(X[course, slot] == 0)
-
-        model.optimize()
+        if trace_path is not None:
+            stats = stats if stats is not None else Stats()
+            trace = Trace(trace_path, stats)
+            on_solution = traced(trace, on_solution)
+
+        start = time.perf_counter()
+        model, X = FORMULATIONS[formulation](courses, slots)
+        build_time = time.perf_counter() - start
+        print(f"Model built in {build_time:.2f} s")
+        if stats is not None:
+            stats.add('build_model', build_time)
+
+        if time_limit is not None:
+            model.Params.TimeLimit = time_limit
+        if mip_gap is not None:
+            model.Params.MIPGap = mip_gap
+        if threads is not None:
+            model.Params.Threads = threads
+        if initial_schedule is not None:
+            set_initial_schedule(X, courses, slots, initial_schedule)
+
+        start = time.perf_counter()
+        if on_solution is not None:
+            model.optimize(solution_callback(X, on_solution))
+        else:
+            model.optimize()
+        if stats is not None:
+            stats.add('optimize', time.perf_counter() - start)
+
+        # With a time limit the model may stop before any schedule was found
+        if model.SolCount == 0:
+            return None
 
         # Retrieve the solution
         solution = {}
@@ -178,4 +404,8 @@ def solve_exam_scheduling(courses, slots, students):
         print("Error code " + str(e.errno) + ": " + str(e))
 
     except AttributeError:
-        print("Encountered an attribute error")
\ No newline at end of file
+        print("Encountered an attribute error")
+
+    finally:
+        if trace is not None:
+            trace.close()
@@ -0,0 +1,92 @@
+import argparse
+import os
+import random
+from datetime import date, timedelta
+
+import InstanceLoader
+from Model import Exam, Course, Students
+
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Instance', 'synthetic')
+START_DATE = date(2023, 7, 1)
+DAYS = 31
+START_TIMES = tuple(f"{hour}:00" for hour in range(8, 17))
+DURATIONS = ('1h 45m', '2h 15m', '2h 30m', '3h 0m', '4h 45m')
+CAPACITY = (200, 700)  # the shipped big_* instances use about this range
+COURSES_PER_GROUP = (25, 30)
+GROUP_SIZE = (15, 25)
+DEPARTMENT_SIZE = 100  # courses per department; a group takes its courses mostly from one department
+DENSITY = 0.1  # share of a group's courses drawn from the whole faculty, more makes the conflict graph denser
+
+
+def generate(num_courses, num_days=DAYS, slots_per_day=None, durations=DURATIONS, capacity=CAPACITY, num_groups=None,
+             courses_per_group=COURSES_PER_GROUP, group_size=GROUP_SIZE, density=DENSITY, department_size=DEPARTMENT_SIZE, seed=0):
+    # Returns the same {'exams', 'courses', 'students'} dictionary as the pickles in Instance/.
+    # Like there, there are as many exams as courses unless slots_per_day says otherwise.
+    rng = random.Random(seed)
+    slots_per_day = slots_per_day or -(-num_courses // num_days)
+    num_groups = num_groups or max(1, num_courses // 2)
+    departments = max(1, num_courses // department_size)
+
+    exams = [Exam(START_DATE + timedelta(days=day), rng.choice(START_TIMES), rng.choice(durations), rng.randint(*capacity))
+             for day in range(num_days) for _ in range(slots_per_day)]
+    courses = [Course(f"Course {i + 1}") for i in range(num_courses)]
+
+    students = []
+    for g in range(num_groups):
+        group = Students(f"Group {g + 1}", rng.randint(*group_size))
+        department = g % departments
+        first = department * num_courses // departments
+        last = (department + 1) * num_courses // departments
+        count = min(rng.randint(*courses_per_group), last - first if density < 1 else num_courses)
+        taken = set()
+        while len(taken) < count:
+            taken.add(rng.randrange(num_courses) if rng.random() < density else rng.randrange(first, last))
+        for c in sorted(taken):
+            group.add_course(courses[c])
+        students.append(group)
+
+    # Every course is taken by at least one group of its department
+    for c, course in enumerate(courses):
+        if not course.groups_of_students:
+            department = min(c * departments // num_courses, departments - 1)
+            choices = students[department::departments] or students
+            rng.choice(choices).add_course(course)
+
+    return {'exams': exams, 'courses': courses, 'students': students}
+
+
+def output_path(num_courses, seed, directory=OUTPUT_DIR):
+    return os.path.join(directory, f"synthetic_{num_courses}_{seed}.npz")
+
+
+def write_instance(data, path):
+    # The loader's columnar format; InstanceLoader.load_instance reads it back
+    InstanceLoader.save_columns(InstanceLoader.to_columns(data), path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic exam scheduling instances in the loader format')
+    parser.add_argument('--courses', type=int, nargs='+', default=[1000, 2000, 5000, 10000, 20000])
+    parser.add_argument('--days', type=int, default=DAYS)
+    parser.add_argument('--slots-per-day', type=int, help='default: enough for one exam per course')
+    parser.add_argument('--durations', nargs='+', default=list(DURATIONS))
+    parser.add_argument('--capacity', type=int, nargs=2, default=list(CAPACITY), metavar=('MIN', 'MAX'))
+    parser.add_argument('--groups', type=int, help='default: half the number of courses')
+    parser.add_argument('--courses-per-group', type=int, nargs=2, default=list(COURSES_PER_GROUP), metavar=('MIN', 'MAX'))
+    parser.add_argument('--group-size', type=int, nargs=2, default=list(GROUP_SIZE), metavar=('MIN', 'MAX'))
+    parser.add_argument('--density', type=float, default=DENSITY)
+    parser.add_argument('--department-size', type=int, default=DEPARTMENT_SIZE)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    args = parser.parse_args(argv)
+
+    for num_courses in args.courses:
+        data = generate(num_courses, args.days, args.slots_per_day, args.durations, args.capacity, args.groups,
+                        args.courses_per_group, args.group_size, args.density, args.department_size, args.seed)
+        path = output_path(num_courses, args.seed, args.output_dir)
+        write_instance(data, path)
+        print(f"{path}: {len(data['courses'])} courses, {len(data['exams'])} exams, {len(data['students'])} groups")
+
+
+if __name__ == '__main__':
+    main()
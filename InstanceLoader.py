@@ -0,0 +1,151 @@
+import hashlib
+import io
+import os
+import pickle
+from datetime import date
+
+import numpy as np
+
+import Model
+from ConflictGraph import get_conflict_graph
+from SlotTable import SlotTable
+
+CACHE_DIR = '.cache'  # next to the source pickles
+FORMAT_VERSION = 1
+MODEL_CLASSES = {
+    'Exam': Model.Exam,
+    'Course': Model.Course,
+    'Students': Model.Students,
+}
+
+
+class InstanceUnpickler(pickle.Unpickler):
+    # The instances were pickled from a script, so their classes are recorded as __main__.Exam and so on;
+    # Model's __setstate__ accepts the old dict state
+    def find_class(self, module, name):
+        if module == '__main__' and name in MODEL_CLASSES:
+            return MODEL_CLASSES[name]
+        return super().find_class(module, name)
+
+
+def content_hash(source):
+    return hashlib.blake2b(source, digest_size=16).hexdigest()
+
+
+def cache_path(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR, name + '.npz')
+
+
+def load_pickle(path):
+    with open(path, 'rb') as file:
+        return InstanceUnpickler(file).load()
+
+
+def flatten(lists):
+    # Variable length rows as one values array plus offsets, row i is values[offsets[i]:offsets[i + 1]]
+    offsets = np.zeros(len(lists) + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum([len(row) for row in lists])
+    values = np.array([value for row in lists for value in row], dtype=np.int32)
+    return values, offsets
+
+
+def rows(values, offsets):
+    values = values.tolist()
+    offsets = offsets.tolist()
+    return [values[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def to_columns(data):
+    exams, courses, students = data['exams'], data['courses'], data['students']
+    slots = SlotTable(exams)
+    graph = get_conflict_graph(courses)
+    course_index = {id(course): i for i, course in enumerate(courses)}
+    group_index = {id(group): i for i, group in enumerate(students)}
+
+    course_groups, course_groups_offsets = flatten([sorted(group_index[id(group)] for group in course.groups_of_students) for course in courses])
+    group_courses, group_courses_offsets = flatten([[course_index[id(course)] for course in group.courses] for group in students])
+    neighbours, neighbours_offsets = flatten(graph.neighbours)
+
+    return {
+        'format_version': np.array(FORMAT_VERSION),
+        'exam_day': np.array(slots.day, dtype=np.int32),
+        'exam_start_time': np.array([exam.start_time for exam in exams], dtype=str),
+        'exam_duration': np.array([exam.duration for exam in exams], dtype=str),
+        'exam_capacity': np.array(slots.capacity, dtype=np.int32),
+        'slot_start': np.array(slots.start, dtype=np.int32),
+        'slot_end': np.array(slots.end, dtype=np.int32),
+        'course_name': np.array([course.name for course in courses], dtype=str),
+        'course_students': np.array([course.num_of_students for course in courses], dtype=np.int32),
+        'course_groups': course_groups,
+        'course_groups_offsets': course_groups_offsets,
+        'group_name': np.array([group.name for group in students], dtype=str),
+        'group_students': np.array([group.num_of_students for group in students], dtype=np.int32),
+        'group_courses': group_courses,
+        'group_courses_offsets': group_courses_offsets,
+        'neighbours': neighbours,
+        'neighbours_offsets': neighbours_offsets,
+        'has_groups': np.array([graph.conflicting(i, i) for i in range(len(graph))], dtype=bool),
+    }
+
+
+def from_columns(columns):
+    Exam, Course, Students = MODEL_CLASSES['Exam'], MODEL_CLASSES['Course'], MODEL_CLASSES['Students']
+
+    exams = [Exam(date.fromordinal(day), start_time, duration, capacity) for day, start_time, duration, capacity in
+             zip(columns['exam_day'].tolist(), columns['exam_start_time'].tolist(),
+                 columns['exam_duration'].tolist(), columns['exam_capacity'].tolist())]
+
+    courses = []
+    for name, size in zip(columns['course_name'].tolist(), columns['course_students'].tolist()):
+        course = Course(name)
+        course.num_of_students = size  # a group may list a course twice, so this is not the sum of the groups
+        courses.append(course)
+
+    students = []
+    for name, size, members in zip(columns['group_name'].tolist(), columns['group_students'].tolist(),
+                                   rows(columns['group_courses'], columns['group_courses_offsets'])):
+        group = Students(name, size)
+        group.courses = [courses[c] for c in members]
+        students.append(group)
+
+    for course, groups in zip(courses, rows(columns['course_groups'], columns['course_groups_offsets'])):
+        course.groups_of_students = {students[g] for g in groups}
+
+    # The conflict graph is already known, so the solvers do not have to rebuild it
+    get_conflict_graph(courses, (columns['neighbours'], columns['neighbours_offsets'], columns['has_groups']))
+    return {'exams': exams, 'courses': courses, 'students': students}
+
+
+def save_columns(columns, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary = path + '.tmp.npz'
+    np.savez(temporary, **columns)
+    os.replace(temporary, path)  # readers never see a half written file
+
+
+def load_instance(path, use_cache=True):
+    # Returns the same {'exams', 'courses', 'students'} dictionary as unpickling the file.
+    # A .npz path is a columnar instance without a pickle behind it, e.g. from InstanceGenerator
+    if path.endswith('.npz'):
+        with np.load(path, allow_pickle=False) as columns:
+            if int(columns['format_version']) != FORMAT_VERSION:
+                raise ValueError(f"{path} has format version {int(columns['format_version'])}, expected {FORMAT_VERSION}")
+            return from_columns(columns)
+
+    with open(path, 'rb') as file:
+        source = file.read()
+    source_hash = content_hash(source)
+    cached = cache_path(path)
+
+    if use_cache and os.path.exists(cached):
+        with np.load(cached, allow_pickle=False) as columns:
+            if str(columns['source_hash']) == source_hash and int(columns['format_version']) == FORMAT_VERSION:
+                return from_columns(columns)
+
+    data = InstanceUnpickler(io.BytesIO(source)).load()
+    if use_cache:
+        columns = to_columns(data)
+        columns['source_hash'] = np.array(source_hash)
+        save_columns(columns, cached)
+    return data
@@ -0,0 +1,79 @@
+import json
+import time
+
+
+class Stats:
+    # Calls, total time and fitness evaluations per instrumented method or phase
+    def __init__(self):
+        self.calls = {}
+        self.times = {}
+        self.evaluations = 0
+        self.start = time.perf_counter()
+
+    def add(self, name, elapsed, evaluations=0):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.times[name] = self.times.get(name, 0.0) + elapsed
+        self.evaluations += evaluations
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def as_dict(self):
+        return {
+            'elapsed': self.elapsed(),
+            'evaluations': self.evaluations,
+            'calls': dict(self.calls),
+            'times': dict(self.times),
+        }
+
+    def __str__(self):
+        lines = [f"{'phase':28} {'calls':>10} {'seconds':>10}"]
+        for name in sorted(self.times, key=self.times.get, reverse=True):
+            lines.append(f"{name:28} {self.calls[name]:>10} {self.times[name]:>10.3f}")
+        lines.append(f"{self.evaluations} fitness evaluations in {self.elapsed():.3f} s")
+        return '\n'.join(lines)
+
+
+class Trace:
+    # One JSON object per line: the solver's fields plus elapsed time and evaluations so far
+    def __init__(self, path, stats):
+        self.file = open(path, 'w')
+        self.stats = stats
+
+    def event(self, **fields):
+        fields['elapsed'] = self.stats.elapsed()
+        fields['evaluations'] = self.stats.evaluations
+        self.file.write(json.dumps(fields) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+def one(*args):
+    return 1
+
+
+def instrument(obj, name, stats, evaluations=None):
+    # Shadows the method on this instance only, so solvers that are not instrumented pay nothing.
+    # evaluations(*args) gives the number of fitness evaluations one call performs.
+    method = getattr(obj, name)
+
+    def wrapper(*args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            stats.add(name, time.perf_counter() - start, 0 if evaluations is None else evaluations(*args))
+
+    setattr(obj, name, wrapper)
+
+
+def profile(solver, trace_path=None):
+    # Runs an ExamScheduleILS or GeneticAlgorithm with instrumentation and returns (result, stats)
+    stats = solver.enable_instrumentation(trace_path)
+    try:
+        result = solver.find_schedule() if hasattr(solver, 'find_schedule') else solver.run()
+    finally:
+        if solver.trace is not None:
+            solver.trace.close()
+    return result, stats
@@ -0,0 +1,116 @@
+import os
+import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from GeneticAlgoritm import GeneticAlgorithm
+
+
+class IslandGeneticAlgorithm:
+    ISLANDS = 4
+    MIGRATION_INTERVAL = 5  # generations between migrations
+    MIGRANTS = 2  # best individuals each island sends along every edge of the topology
+    TOPOLOGY = 'ring'  # 'ring' or 'full'
+    SEED = 0
+
+    def __init__(self, exams, courses, students):
+        self.exams = exams
+        self.courses = courses
+        self.students = students
+        self.genetic_algorithm = GeneticAlgorithm(exams, courses, students)
+
+    def run(self):
+        ga = self.genetic_algorithm
+        islands = IslandGeneticAlgorithm.ISLANDS
+        initial = ga.to_chromosome(ga.find_initial_schedule())
+
+        populations = [None] * islands
+        fitnesses = [None] * islands
+        random_states = [random.Random(IslandGeneticAlgorithm.SEED + i).getstate() for i in range(islands)]
+        statistics = [{'island': i, 'history': [], 'migrants_received': 0} for i in range(islands)]
+
+        workers = min(islands, os.cpu_count() or 1)
+        with ProcessPoolExecutor(workers, initializer=init_island_worker,
+                                 initargs=(self.exams, self.courses, self.students, initial)) as pool:
+            remaining = GeneticAlgorithm.NUMBER_OF_GENERATIONS
+            while remaining > 0:
+                generations = min(IslandGeneticAlgorithm.MIGRATION_INTERVAL, remaining)
+                remaining -= generations
+
+                futures = [pool.submit(evolve_island, populations[i], random_states[i], generations) for i in range(islands)]
+                for i, future in enumerate(futures):
+                    populations[i], fitnesses[i], random_states[i] = future.result()
+                    statistics[i]['history'].append(min(fitnesses[i]))
+
+                if remaining > 0:
+                    self.migrate(populations, fitnesses, statistics)
+
+        for i in range(islands):
+            statistics[i]['best_fitness'] = min(fitnesses[i])
+            statistics[i]['mean_fitness'] = sum(fitnesses[i]) / len(fitnesses[i])
+
+        best_island = min(range(islands), key=lambda i: statistics[i]['best_fitness'])
+        chromosomes = split_population(populations[best_island], ga.typecode, len(self.courses))
+        best_chromosome = chromosomes[fitnesses[best_island].index(statistics[best_island]['best_fitness'])]
+        return ga.to_schedule(best_chromosome), statistics
+
+    def sources(self, island):
+        islands = IslandGeneticAlgorithm.ISLANDS
+        if IslandGeneticAlgorithm.TOPOLOGY == 'ring':
+            return [(island - 1) % islands] if islands > 1 else []
+        if IslandGeneticAlgorithm.TOPOLOGY == 'full':
+            return [j for j in range(islands) if j != island]
+        raise ValueError(f"Unknown topology: {IslandGeneticAlgorithm.TOPOLOGY}")
+
+    def migrate(self, populations, fitnesses, statistics):
+        ga = self.genetic_algorithm
+        size = len(self.courses)
+        chromosomes = [split_population(population, ga.typecode, size) for population in populations]
+
+        # Emigrants are chosen before any island is changed, so the result does not depend on island order
+        emigrants = []
+        for island, fitness in enumerate(fitnesses):
+            best = sorted(range(len(fitness)), key=lambda i: fitness[i])[:IslandGeneticAlgorithm.MIGRANTS]
+            emigrants.append([(chromosomes[island][i], fitness[i]) for i in best])
+
+        for island, fitness in enumerate(fitnesses):
+            immigrants = [migrant for source in self.sources(island) for migrant in emigrants[source]]
+            worst = sorted(range(len(fitness)), key=lambda i: fitness[i], reverse=True)[:len(immigrants)]
+            for i, (chromosome, migrant_fitness) in zip(worst, immigrants):
+                chromosomes[island][i] = chromosome[:]
+                fitness[i] = migrant_fitness
+            statistics[island]['migrants_received'] += len(worst)
+            populations[island] = b''.join(chromosomes[island])
+
+
+def split_population(population, typecode, size):
+    chromosome = array(typecode)
+    chromosome.frombytes(population)
+    return [chromosome[i:i + size] for i in range(0, len(chromosome), size)]
+
+
+worker_algorithm = None
+worker_initial = None
+
+
+def init_island_worker(exams, courses, students, initial):
+    global worker_algorithm, worker_initial
+    worker_algorithm = GeneticAlgorithm(exams, courses, students)
+    worker_initial = initial
+
+
+def evolve_island(population, random_state, generations):
+    ga = worker_algorithm
+    random.setstate(random_state)
+
+    if population is None:
+        population = [ga.generate_candidate(worker_initial) for _ in range(GeneticAlgorithm.POPULATION_SIZE)]
+    else:
+        population = split_population(population, ga.typecode, len(ga.courses))
+
+    for _ in range(generations):
+        population = ga.selection(population)
+        population = ga.crossover(population)
+        ga.mutation(population)
+
+    return b''.join(population), ga.population_fitness(population), random.getstate()
@@ -1,46 +1,17 @@
 import datetime
 from datetime import date, timedelta
 import random
-import copy
+from array import array
+from SlotTable import SlotTable, parse_time, parse_duration
+from Model import Exam, Course, Students
+from ConflictGraph import get_conflict_graph
+from ScheduleEvaluator import ScheduleEvaluator
+from FitnessCache import FitnessCache
+from Neighbourhood import Neighbourhood, SWAP, move_delta, apply_move, first_improvement, best_improvement
+from Instrumentation import Stats, Trace, instrument, one
+from Construction import Construction
+from Anytime import Budget
 
-class Exam:
-    def __init__(self, date, start_time, duration, capacity):
-        self.date = date
-        self.start_time = start_time
-        self.duration = duration
-        self.capacity = capacity
-
-    def __str__(self):
-        return f"The exam is scheduled for {self.date} starting at {self.start_time} and lasts {self.duration} hours. This exam can accommodate {self.capacity} students."
-
-    
-class Course:
-    def __init__(self, name):
-        self.name = name
-        self.groups_of_students = set()  # Groups of students taking this course
-        self.num_of_students = 0
-
-    def add_students(self, students_group, number_of_students):
-        self.groups_of_students.add(students_group) 
-        self.num_of_students += number_of_students
-
-    def __str__(self):
-        return f"Course: {self.name}"
-
-
-class Students:
-    def __init__(self, name, number_of_students):
-        self.name = name
-        self.num_of_students = number_of_students
-        self.courses = []
-
-    def add_course(self, course):
-        self.courses.append(course)
-        course.add_students(self, self.num_of_students)
-
-    def __str__(self):
-        return f"{self.name} - There are {self.num_of_students} students"
-    
 class ExamScheduleILS:
     
     NUMBER_OF_ITERATIONS = 50
@@ -48,34 +19,143 @@ class ExamScheduleILS:
     LIGHT_CONSTRAINT_PENALTY = 100
     START_TIME_FACTOR = 0
 
+    NEIGHBOURHOOD_MOVES = (SWAP,)
+    NEIGHBOURHOOD_SCAN = 'random'  # 'random' (one sampled move per step), 'first' or 'best' of NEIGHBOURHOOD_SAMPLE_SIZE
+    NEIGHBOURHOOD_SAMPLE_SIZE = 10
+    FITNESS_CACHE_SIZE = 100000
+    CONSTRUCTION_STARTS = 1  # more than 1 keeps the best of several randomized constructions
+
+    ADAPTIVE = False  # aim perturbations at penalized courses, then partially restart, while the search stagnates
+    STAGNATION_WINDOW = 5  # iterations without improvement before perturbations target penalized courses
+    RESTART_WINDOW = 40  # iterations without improvement before a partial restart
+    RESTART_FRACTION = 0.25  # share of the penalized courses reassigned by a partial restart
+    INSTRUMENTED_METHODS = ('find_initial_schedule', 'perturb', 'descend', 'select_move', 'generate_neighbors')
+
     def __init__(self, exams, courses, students):
         self.exams = exams
         self.courses = courses
         self.students = students
-        
+        self.slots = SlotTable(exams)
+        self.graph = get_conflict_graph(courses)
+        self.fitness_cache = FitnessCache(ExamScheduleILS.FITNESS_CACHE_SIZE)
+        self.stats = None
+        self.trace = None
+        self.adaptation_log = []
+        self.refresh_penalties()
+        self.neighbourhood = Neighbourhood(self.slots, ExamScheduleILS.NEIGHBOURHOOD_MOVES)
+        self.construction = Construction(self.slots, self.graph)
+
+    def refresh_penalties(self):
+        penalties = (ExamScheduleILS.HARD_CONSTRAINT_PENALTY, ExamScheduleILS.LIGHT_CONSTRAINT_PENALTY, ExamScheduleILS.START_TIME_FACTOR)
+        if not self.fitness_cache.validate(penalties):
+            self.evaluator = ScheduleEvaluator(self.slots, self.graph, *penalties)
+            if self.stats is not None:
+                self.instrument_evaluator()
+
+    def enable_instrumentation(self, trace_path=None):
+        self.stats = Stats()
+        for name in ExamScheduleILS.INSTRUMENTED_METHODS:
+            instrument(self, name, self.stats)
+        instrument(self, 'calculate_schedule_fitness', self.stats, one)
+        self.instrument_evaluator()
+        self.trace = Trace(trace_path, self.stats) if trace_path is not None else None
+        return self.stats
+
+    def instrument_evaluator(self):
+        instrument(self.evaluator, 'move_delta', self.stats, one)
+        instrument(self.evaluator, 'swap_delta', self.stats, one)
+
     def find_schedule(self):
+        best_schedule = None
+        for best_schedule, _ in self.anytime(Budget()):
+            pass
+        return best_schedule
+
+    def anytime(self, budget):
+        # Yields (schedule, fitness) for the initial schedule and every improvement until the budget is spent.
+        # The evaluator stays on the best schedule: each candidate is made and improved by moves on it,
+        # and the moves are undone when the candidate is no better
         best_schedule = self.find_initial_schedule()
-        best_fitness = self.calculate_schedule_fitness(best_schedule)
-    
-        for _ in range(ExamScheduleILS.NUMBER_OF_ITERATIONS):
-            
-            candidate_schedule = self.generate_candidate(best_schedule)
-            
-            improved_schedule = self.local_search(candidate_schedule)
-            potential_best = self.calculate_schedule_fitness(improved_schedule)
-                        
+        evaluator = self.evaluator
+        best_fitness = evaluator.load(best_schedule)
+        best_assignment = evaluator.assignment[:]
+        budget.spend(1)
+        yield best_schedule, best_fitness
+
+        iteration = 0
+        stale = 0  # iterations since the last improvement
+        penalized = self.penalized_courses() if ExamScheduleILS.ADAPTIVE else None
+        while not budget.expired(iteration, ExamScheduleILS.NUMBER_OF_ITERATIONS):
+            self.refresh_penalties()
+            if self.evaluator is not evaluator:  # the penalty constants changed, rescore the best schedule
+                evaluator = self.evaluator
+                best_fitness = evaluator.load_assignment(best_assignment)
+
+            changes = []  # (course, previous slot) of every move made since the best schedule
+            if ExamScheduleILS.ADAPTIVE and stale >= ExamScheduleILS.STAGNATION_WINDOW:
+                self.adaptive_perturb(evaluator, penalized, iteration, stale, changes)
+            else:
+                self.perturb(evaluator, changes)
+
+            evaluations = evaluator.evaluations
+            potential_best = self.descend(evaluator, changes)
+            budget.spend(evaluator.evaluations - evaluations + 1)
+
             if potential_best < best_fitness:
                 best_fitness = potential_best
-                best_schedule = improved_schedule
-
-        return best_schedule
+                best_assignment = evaluator.assignment[:]
+                best_schedule = evaluator.to_schedule()
+                stale = 0
+                if ExamScheduleILS.ADAPTIVE:
+                    penalized = self.penalized_courses()
+                yield best_schedule, best_fitness
+            else:
+                for c, slot in reversed(changes):
+                    evaluator.apply_move(c, slot)
+                stale += 1
+
+            if self.trace is not None:
+                self.trace.event(iteration=iteration, fitness=best_fitness, candidate_fitness=potential_best)
+            iteration += 1
+
+    def adaptive_perturb(self, evaluator, penalized, iteration, stale, changes):
+        # A stagnating search reassigns only courses that still cost something, and every
+        # RESTART_WINDOW stale iterations a RESTART_FRACTION of them at once
+        if stale % ExamScheduleILS.RESTART_WINDOW == 0:
+            strength = max(2, int(len(penalized) * ExamScheduleILS.RESTART_FRACTION))
+            self.log_adaptation(iteration=iteration, stale=stale, action='partial_restart', strength=strength)
+        else:
+            strength = 1
+            if stale == ExamScheduleILS.STAGNATION_WINDOW:
+                self.log_adaptation(iteration=iteration, stale=stale, action='target_penalized', courses=len(penalized))
+        self.perturb(evaluator, changes, strength, penalized or None)
+
+    def penalized_courses(self):
+        return [c for c, penalty in enumerate(self.evaluator.penalties) if penalty > 0]
+
+    def log_adaptation(self, **decision):
+        self.adaptation_log.append(decision)
+        if self.trace is not None:
+            self.trace.event(**decision)
     
-    def find_initial_schedule(self):
+    def find_initial_schedule(self, rng=None):
+        self.refresh_penalties()
+        if ExamScheduleILS.CONSTRUCTION_STARTS > 1:
+            assignment = self.construction.best_of(ExamScheduleILS.CONSTRUCTION_STARTS, self.evaluator.load_assignment, rng)
+        else:
+            assignment = self.construction.construct(rng)
+        return {course: (self.exams[slot] if slot >= 0 else None) for course, slot in zip(self.courses, assignment)}
+
+    def first_fit_schedule(self, rng=None):
         schedule = {}
+        courses, exams = self.courses, self.exams
+        if rng is not None:  # randomized construction: visit courses and exams in a shuffled order
+            courses = rng.sample(courses, len(courses))
+            exams = rng.sample(exams, len(exams))
 
-        for course in self.courses:
+        for course in courses:
             found = False
-            for exam in self.exams:   
+            for exam in exams:   
 
                 if not self.is_acceptable(exam, course):
                     continue
@@ -98,56 +178,90 @@ class ExamScheduleILS:
             if not found:    
                 schedule[course] = None
 
+        if rng is not None:
+            schedule = {course: schedule[course] for course in self.courses}
         return schedule   
 
-    def generate_candidate(self, current_schedule):
-        candidate_schedule = copy.deepcopy(current_schedule)
+    def generate_candidate(self, current_schedule, strength=1, courses=None):
+        candidate_schedule = current_schedule.copy()
+        if courses is None:
+            courses = list(candidate_schedule.keys())
 
-        course = random.choice(list(candidate_schedule.keys()))
+        for _ in range(strength):
+            course = random.choice(courses)
 
-        new_exam = random.choice(self.exams)
+            new_exam = random.choice(self.exams)
 
-        candidate_schedule[course] = new_exam
+            candidate_schedule[course] = new_exam
 
         return candidate_schedule
 
+    def perturb(self, evaluator, changes, strength=1, courses=None):
+        # generate_candidate as moves on the evaluator, drawing the same random numbers
+        for _ in range(strength):
+            c = random.choice(courses) if courses is not None else random.randrange(len(self.courses))
+            slot = random.randrange(len(self.exams))
+            changes.append((c, evaluator.assignment[c]))
+            evaluator.apply_move(c, slot)
+
     def local_search(self, initial_schedule):
-        best_schedule = initial_schedule
-        best_fitness = self.calculate_schedule_fitness(best_schedule)
+        return self.improve_schedule(initial_schedule)[0]
+
+    def improve_schedule(self, initial_schedule):
+        self.refresh_penalties()
+        self.evaluator.load(initial_schedule)
+        best_fitness = self.descend(self.evaluator)
+        return self.evaluator.to_schedule(), best_fitness
 
+    def descend(self, evaluator, changes=None):
+        # Improving moves from the evaluator's current schedule, each recorded in changes when given
         for _ in range(ExamScheduleILS.NUMBER_OF_ITERATIONS):
-            neighbors = self.generate_neighbors(best_schedule)
-            if not neighbors:
+            move, delta = self.select_move(evaluator)
+            if move is None and delta is None:
                 break
-            
-            neighbor = random.choice(neighbors)
-            neighbor_fitness = self.calculate_schedule_fitness(neighbor)
 
-            if neighbor_fitness < best_fitness:
-                best_schedule = neighbor
-                best_fitness = neighbor_fitness
+            if move is not None and delta < 0:
+                if changes is not None:
+                    changes.append((move[1], evaluator.assignment[move[1]]))
+                    if move[0] == SWAP:
+                        changes.append((move[2], evaluator.assignment[move[2]]))
+                apply_move(evaluator, move)
 
-        return best_schedule
+        return evaluator.fitness
 
-    def generate_neighbors(self, schedule):
-        neighbors = []
+    def select_move(self, evaluator):
+        if ExamScheduleILS.NEIGHBOURHOOD_SCAN == 'first':
+            moves = self.neighbourhood.samples(evaluator, ExamScheduleILS.NEIGHBOURHOOD_SAMPLE_SIZE)
+            return first_improvement(evaluator, moves)
+        if ExamScheduleILS.NEIGHBOURHOOD_SCAN == 'best':
+            moves = self.neighbourhood.samples(evaluator, ExamScheduleILS.NEIGHBOURHOOD_SAMPLE_SIZE)
+            return best_improvement(evaluator, moves)
 
-        for course1, exam1 in schedule.items():
-            if exam1 is None:
-                continue
+        move = self.neighbourhood.sample(evaluator)
+        if move is None:
+            return None, None  # the neighbourhood is empty
+        return move, move_delta(evaluator, move)
 
-            for course2, exam2 in schedule.items():
-                if exam2 is None or course1 == course2:
-                    continue
-
-                neighbor = schedule.copy()
-                neighbor[course1], neighbor[course2] = exam2, exam1
-                neighbors.append(neighbor)
-
-        return neighbors
+    def generate_neighbors(self, schedule):
+        self.evaluator.load(schedule)
+        return self.neighbourhood.moves(self.evaluator)
 
 
     def calculate_schedule_fitness(self, schedule):
+        self.refresh_penalties()
+        if len(schedule) != len(self.courses):
+            return self.score_schedule(schedule)
+
+        slot_of = self.slots.slot_of
+        assignment = array('i', (-1 if schedule.get(course) is None else slot_of(schedule[course]) for course in self.courses))
+        key = self.fitness_cache.key(assignment)
+        fitness = self.fitness_cache.get(key)
+        if fitness is None:
+            fitness = self.score_schedule(schedule)
+            self.fitness_cache.put(key, fitness)
+        return fitness
+
+    def score_schedule(self, schedule):
         fitness = 0
                 
         for course, exam in schedule.items():
@@ -186,81 +300,93 @@ class ExamScheduleILS:
         return True
     
     def conflicts_exist(self, schedule, exam, course):
-        for other_course, other_exam in schedule.items():
+        slots = self.slots
+        slot = slots.slot_of(exam)
+        for other_course in self.graph.neighbours_of(course):
+            other_exam = schedule.get(other_course)
             if other_exam is None or other_exam == exam:
                 continue
 
-            if self.together(other_course, course) and other_exam.date == exam.date and not (self.is_exam_finished(other_exam, exam) or self.is_exam_finished(exam, other_exam)):
+            if slots.overlap(slots.slot_of(other_exam), slot):
                 return True
         return False
     
     def has_consecutive_days(self, schedule, exam, course):
-        for other_course, other_exam in schedule.items():
+        slots = self.slots
+        slot = slots.slot_of(exam)
+        for other_course in self.graph.neighbours_of(course):
+            other_exam = schedule.get(other_course)
             if other_exam is None or other_exam == exam:
                 continue
 
-            if self.together(other_course, course) and self.are_days_consecutive(other_exam.date, exam.date):
+            if slots.consecutive(slots.slot_of(other_exam), slot):
                 return True
         return False
 
     
     def same_day_different_time(self, schedule, exam, course):
-        for other_course, other_exam in schedule.items():
+        slots = self.slots
+        slot = slots.slot_of(exam)
+        for other_course in self.graph.neighbours_of(course):
+            other_exam = schedule.get(other_course)
             if other_exam is None or other_exam == exam:
                 continue
 
-            if self.together(other_course, course) and other_exam.date == exam.date and (self.is_exam_finished(other_exam, exam) or self.is_exam_finished(exam, other_exam)):
+            if slots.apart(slots.slot_of(other_exam), slot):
                 return True
 
         return False
 
-
     def no_conflicts(self, exam, course, schedule):
-        for c, e in schedule.items():
-            if e is not None and self.together(course, c) and (e.date == exam.date or self.are_days_consecutive(e.date, exam.date)):
+        slots = self.slots
+        slot = slots.slot_of(exam)
+        for c in self.graph.neighbours_of(course):
+            e = schedule.get(c)
+            if e is None:
+                continue
+            other_slot = slots.slot_of(e)
+            if slots.same_day(other_slot, slot) or slots.consecutive(other_slot, slot):
                 return False
         return True
     
     def together(self, course1, course2):
-        return bool(course1.groups_of_students & course2.groups_of_students)
+        return self.graph.together(course1, course2)
     
     def are_days_consecutive(self, date1, date2):
         delta = datetime.timedelta(days=1)
         return (date2 - date1) == delta
     
     def on_consecutive_days(self, exam, course, schedule):
-        for c, e in schedule.items():
-            if e is not None and self.together(course, c) and e.date != exam.date:
-                if self.are_days_consecutive(e.date, exam.date) and self.no_conflicts(exam, course, schedule):
+        slots = self.slots
+        slot = slots.slot_of(exam)
+        for c in self.graph.neighbours_of(course):
+            e = schedule.get(c)
+            if e is not None:
+                other_slot = slots.slot_of(e)
+                if not slots.same_day(other_slot, slot) and slots.consecutive(other_slot, slot) and self.no_conflicts(exam, course, schedule):
                     return True
         return False
     
     def can_schedule_exam(self, exam, course, schedule):
-        for given_course, scheduled_exam in schedule.items():
-            if scheduled_exam is not None and self.together(course, given_course) and scheduled_exam.date == exam.date:
-                if not (self.is_exam_finished(exam, scheduled_exam) or self.is_exam_finished(scheduled_exam, exam)):
-                    return False
+        slots = self.slots
+        slot = slots.slot_of(exam)
+        for given_course in self.graph.neighbours_of(course):
+            scheduled_exam = schedule.get(given_course)
+            if scheduled_exam is not None and slots.overlap(slot, slots.slot_of(scheduled_exam)):
+                return False
         return True
 
     def is_exam_finished(self, exam1, exam2):
-        exam1_end_time = self.get_start_time(exam1) + self.parse_duration(exam1.duration)
-        exam2_start_time = self.get_start_time(exam2)
-        return exam1_end_time <= exam2_start_time
+        return self.slots.is_finished(self.slots.slot_of(exam1), self.slots.slot_of(exam2))
 
     def get_start_time(self, exam):
-        return self.parse_time(exam.start_time)
+        return self.slots.start[self.slots.slot_of(exam)]
 
     def parse_time(self, time_string):
-        hours, minutes = time_string.split(":")
-        hours = int(hours) if hours else 0
-        minutes = int(minutes) if minutes else 0
-        return hours * 60 + minutes
+        return parse_time(time_string)
 
     def parse_duration(self, duration_string):
-        hours, minutes = duration_string.split("h")
-        hours = int(hours.strip()) if hours else 0
-        minutes = int(minutes.strip().replace("m", "")) if minutes else 0
-        return int(hours) * 60 + int(minutes)
+        return parse_duration(duration_string)
     
 def print_schedule(schedule):
     if schedule:
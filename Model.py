@@ -0,0 +1,74 @@
+from SlotTable import parse_time, parse_duration
+
+
+def restore(obj, state):
+    # Instances pickled before these classes had __slots__ carry a plain dict of attributes,
+    # newer ones a (None, slots) pair; derived fields are recomputed either way and fields
+    # these classes no longer have, like the id of earlier versions, are skipped
+    if isinstance(state, tuple):
+        state = {**(state[0] or {}), **state[1]}
+    for name, value in state.items():
+        if name in obj.__slots__:
+            setattr(obj, name, value)
+
+
+class Exam:
+    __slots__ = ('date', 'start_time', 'duration', 'capacity', 'start', 'end', 'day')
+
+    def __init__(self, date, start_time, duration, capacity):
+        self.date = date
+        self.start_time = start_time
+        self.duration = duration
+        self.capacity = capacity
+        self.cache_derived()
+
+    def cache_derived(self):
+        # Minutes from midnight and the day ordinal, parsed once instead of on every comparison
+        self.start = parse_time(self.start_time)
+        self.end = self.start + parse_duration(self.duration)
+        self.day = self.date.toordinal()
+
+    def __setstate__(self, state):
+        restore(self, state)
+        self.cache_derived()
+
+    def __str__(self):
+        return f"The exam is scheduled for {self.date} starting at {self.start_time} and lasts {self.duration} hours. This exam can accommodate {self.capacity} students."
+
+
+class Course:
+    __slots__ = ('name', 'groups_of_students', 'num_of_students')
+
+    def __init__(self, name):
+        self.name = name
+        self.groups_of_students = set()  # Groups of students taking this course
+        self.num_of_students = 0
+
+    def add_students(self, students_group, number_of_students):
+        self.groups_of_students.add(students_group)
+        self.num_of_students += number_of_students
+
+    def __setstate__(self, state):
+        restore(self, state)
+
+    def __str__(self):
+        return f"Course: {self.name}"
+
+
+class Students:
+    __slots__ = ('name', 'num_of_students', 'courses')
+
+    def __init__(self, name, number_of_students):
+        self.name = name
+        self.num_of_students = number_of_students
+        self.courses = []
+
+    def add_course(self, course):
+        self.courses.append(course)
+        course.add_students(self, self.num_of_students)
+
+    def __setstate__(self, state):
+        restore(self, state)
+
+    def __str__(self):
+        return f"{self.name} - There are {self.num_of_students} students"
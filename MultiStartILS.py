@@ -0,0 +1,94 @@
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Value
+
+from IteratedLocalSearch import ExamScheduleILS
+
+
+class MultiStartILS:
+    TRAJECTORIES = 8
+    WORKERS = os.cpu_count() or 1
+    TIME_LIMIT = None  # seconds for the whole run, None runs every trajectory to its iteration budget
+    ITERATIONS = ExamScheduleILS.NUMBER_OF_ITERATIONS  # perturbation + local search rounds per trajectory
+    RESTART_PATIENCE = 10  # rounds without improvement before a trajectory may restart
+    RESTART_GAP = 0.1  # restart when the trajectory is more than 10% above the shared incumbent
+    SEED = 0
+
+    def __init__(self, exams, courses, students):
+        self.exams = exams
+        self.courses = courses
+        self.students = students
+        self.trajectory_statistics = []
+
+    def find_schedule(self):
+        # The best fitness found by any trajectory, visible to every worker
+        incumbent = Value('q', -1)
+        deadline = time.time() + MultiStartILS.TIME_LIMIT if MultiStartILS.TIME_LIMIT is not None else None
+
+        with ProcessPoolExecutor(min(MultiStartILS.WORKERS, MultiStartILS.TRAJECTORIES), initializer=init_trajectory_worker,
+                                 initargs=(self.exams, self.courses, self.students, incumbent)) as pool:
+            futures = [pool.submit(run_trajectory, MultiStartILS.SEED + i, deadline) for i in range(MultiStartILS.TRAJECTORIES)]
+            results = [future.result() for future in futures]
+
+        self.trajectory_statistics = [statistics for _, _, statistics in results]
+        best_fitness, best_assignment, _ = min(results, key=lambda result: result[0])
+        return {course: (self.exams[slot] if slot >= 0 else None) for course, slot in zip(self.courses, best_assignment)}
+
+
+worker_ils = None
+worker_incumbent = None
+
+
+def init_trajectory_worker(exams, courses, students, incumbent):
+    global worker_ils, worker_incumbent
+    worker_ils = ExamScheduleILS(exams, courses, students)
+    worker_incumbent = incumbent
+
+
+def publish(fitness):
+    with worker_incumbent.get_lock():
+        if worker_incumbent.value < 0 or fitness < worker_incumbent.value:
+            worker_incumbent.value = fitness
+        return worker_incumbent.value
+
+
+def run_trajectory(seed, deadline):
+    ils = worker_ils
+    random.seed(seed)  # every trajectory draws from its own stream
+    statistics = {'seed': seed, 'iterations': 0, 'restarts': 0}
+
+    current = ils.find_initial_schedule(random)
+    current_fitness = ils.calculate_schedule_fitness(current)
+    best, best_fitness = current, current_fitness
+    incumbent = publish(best_fitness)
+    stale = 0
+
+    for _ in range(MultiStartILS.ITERATIONS):
+        if deadline is not None and time.time() >= deadline:
+            break
+        statistics['iterations'] += 1
+
+        candidate = ils.generate_candidate(current)
+        improved, fitness = ils.improve_schedule(candidate)
+        if fitness < current_fitness:
+            current, current_fitness = improved, fitness
+            stale = 0
+            if fitness < best_fitness:
+                best, best_fitness = improved, fitness
+                incumbent = publish(best_fitness)
+        else:
+            stale += 1
+            incumbent = worker_incumbent.value
+
+        if stale >= MultiStartILS.RESTART_PATIENCE and current_fitness > incumbent * (1 + MultiStartILS.RESTART_GAP):
+            current = ils.find_initial_schedule(random)
+            current_fitness = ils.calculate_schedule_fitness(current)
+            statistics['restarts'] += 1
+            stale = 0
+
+    statistics['best_fitness'] = best_fitness
+    slot_of = ils.slots.slot_of
+    assignment = [-1 if best[course] is None else slot_of(best[course]) for course in ils.courses]
+    return best_fitness, assignment, statistics
@@ -0,0 +1,113 @@
+import random
+
+# Moves are plain tuples describing a change, never a copy of the schedule:
+#   (SWAP, course1, course2)   exchange the slots of two scheduled courses
+#   (REASSIGN, course, slot)   put a course into any slot
+#   (SHIFT, course, slot)      move a scheduled course to another slot on the same day
+SWAP = 'swap'
+REASSIGN = 'reassign'
+SHIFT = 'shift'
+
+
+class Neighbourhood:
+    MAX_REJECTIONS = 1000
+
+    def __init__(self, slots, kinds=(SWAP,), rng=random):
+        self.slots = slots
+        self.kinds = tuple(kinds)
+        self.rng = rng
+        self.slots_by_day = {}
+        for s in range(len(slots)):
+            self.slots_by_day.setdefault(slots.day[s], []).append(s)
+
+    def random_scheduled_course(self, assignment):
+        for _ in range(Neighbourhood.MAX_REJECTIONS):
+            c = self.rng.randrange(len(assignment))
+            if assignment[c] >= 0:
+                return c
+        scheduled = [c for c, s in enumerate(assignment) if s >= 0]
+        return self.rng.choice(scheduled)
+
+    def sample(self, evaluator):
+        assignment = evaluator.assignment
+        kind = self.kinds[0] if len(self.kinds) == 1 else self.rng.choice(self.kinds)
+
+        if kind == SWAP:
+            if evaluator.num_scheduled < 2:
+                return None
+            course1 = self.random_scheduled_course(assignment)
+            course2 = course1
+            while course2 == course1:
+                course2 = self.random_scheduled_course(assignment)
+            return SWAP, course1, course2
+
+        if kind == REASSIGN:
+            if not len(assignment):
+                return None
+            return REASSIGN, self.rng.randrange(len(assignment)), self.rng.randrange(len(self.slots))
+
+        if kind == SHIFT:
+            if evaluator.num_scheduled < 1:
+                return None
+            course = self.random_scheduled_course(assignment)
+            return SHIFT, course, self.rng.choice(self.slots_by_day[self.slots.day[assignment[course]]])
+
+        raise ValueError(f"Unknown move kind: {kind}")
+
+    def samples(self, evaluator, k):
+        for _ in range(k):
+            move = self.sample(evaluator)
+            if move is None:
+                return
+            yield move
+
+    def moves(self, evaluator):
+        # Every move of the configured kinds, generated lazily in a fixed order
+        assignment = evaluator.assignment
+        for kind in self.kinds:
+            for course1, slot1 in enumerate(assignment):
+                if kind == SWAP:
+                    if slot1 < 0:
+                        continue
+                    for course2, slot2 in enumerate(assignment):
+                        if slot2 >= 0 and course1 != course2:
+                            yield SWAP, course1, course2
+                elif kind == REASSIGN:
+                    for slot in range(len(self.slots)):
+                        if slot != slot1:
+                            yield REASSIGN, course1, slot
+                elif kind == SHIFT:
+                    if slot1 < 0:
+                        continue
+                    for slot in self.slots_by_day[self.slots.day[slot1]]:
+                        if slot != slot1:
+                            yield SHIFT, course1, slot
+
+
+def move_delta(evaluator, move):
+    if move[0] == SWAP:
+        return evaluator.swap_delta(move[1], move[2])
+    return evaluator.move_delta(move[1], move[2])
+
+
+def apply_move(evaluator, move):
+    if move[0] == SWAP:
+        return evaluator.apply_swap(move[1], move[2])
+    return evaluator.apply_move(move[1], move[2])
+
+
+def first_improvement(evaluator, moves):
+    for move in moves:
+        delta = move_delta(evaluator, move)
+        if delta < 0:
+            return move, delta
+    return None, 0
+
+
+def best_improvement(evaluator, moves):
+    best_move, best_delta = None, 0
+    for move in moves:
+        delta = move_delta(evaluator, move)
+        if delta < best_delta:
+            best_move, best_delta = move, delta
+    return best_move, best_delta
@@ -0,0 +1,113 @@
+import random
+
+from SlotTable import SlotTable
+from ConflictGraph import refresh_conflict_graph
+from ScheduleEvaluator import ScheduleEvaluator
+from Neighbourhood import SWAP, REASSIGN, move_delta, apply_move
+from IteratedLocalSearch import ExamScheduleILS
+from Anytime import Budget
+
+
+class InstanceDiff:
+    # What changed since the previous schedule was made. Edit the objects themselves first:
+    # exam.capacity = 40 (call exam.cache_derived() after changing its date or times),
+    # exams.remove(exam), group.add_course(course), courses.append(course), ...
+    def __init__(self, exams=(), removed_exams=(), courses=()):
+        self.exams = list(exams)  # added exams and exams whose capacity, date or times changed
+        self.removed_exams = list(removed_exams)
+        self.courses = list(courses)  # added courses and courses whose groups of students changed
+
+
+class ScheduleRepair:
+    # Keeps every course of the previous schedule in place except those touched by the diff and
+    # their conflict neighbours that now break a hard constraint, and re-optimizes only those with
+    # a bounded local search. Scores with ExamScheduleILS's penalties.
+    NEIGHBOURHOOD_DEPTH = 1  # broken conflict neighbours of a touched course, this many steps away, may move as well
+    MOVES_PER_COURSE = 50  # sampled moves per free course when no budget is given
+    SWAP_PROBABILITY = 0.3
+
+    def __init__(self, exams, courses, students):
+        self.exams = exams
+        self.courses = courses
+        self.students = students
+        self.free = []  # indices of the courses the last repair was allowed to move
+        self.moved = []  # courses whose exam differs from the previous schedule
+
+    def repair(self, previous_schedule, diff, time_limit=None, max_evaluations=None):
+        slots = SlotTable(self.exams)
+        graph = refresh_conflict_graph(self.courses)
+        evaluator = ScheduleEvaluator(slots, graph, ExamScheduleILS.HARD_CONSTRAINT_PENALTY,
+                                      ExamScheduleILS.LIGHT_CONSTRAINT_PENALTY, ExamScheduleILS.START_TIME_FACTOR)
+
+        # Exams that were removed map to -1, so their courses start unscheduled
+        index = {id(exam): s for s, exam in enumerate(self.exams)}
+        assignment = [index.get(id(previous_schedule.get(course)), -1) for course in self.courses]
+        evaluator.load_assignment(assignment)
+
+        self.free = self.free_courses(previous_schedule, diff, evaluator)
+        budget = Budget(time_limit, max_evaluations)
+        self.reinsert(evaluator, budget)
+        self.local_search(evaluator, budget)
+
+        schedule = evaluator.to_schedule()
+        self.moved = [course for course in self.courses if schedule[course] is not previous_schedule.get(course)]
+        return schedule
+
+    def free_courses(self, previous_schedule, diff, evaluator):
+        touched_exams = {id(exam) for exam in diff.exams + diff.removed_exams}
+        touched_courses = {id(course) for course in diff.courses}
+        frontier = {c for c, course in enumerate(self.courses)
+                    if id(course) in touched_courses or course not in previous_schedule
+                    or id(previous_schedule[course]) in touched_exams}
+
+        hard = ExamScheduleILS.HARD_CONSTRAINT_PENALTY - ExamScheduleILS.LIGHT_CONSTRAINT_PENALTY
+        free = set(frontier)
+        for _ in range(ScheduleRepair.NEIGHBOURHOOD_DEPTH):
+            frontier = {n for c in frontier for n in evaluator.graph.neighbours[c] if evaluator.penalties[n] >= hard} - free
+            free |= frontier
+        return sorted(free)
+
+    def fitting_slots(self, evaluator, c):
+        return [s for s in range(len(evaluator.slots)) if evaluator.slots.capacity[s] >= evaluator.sizes[c]]
+
+    def reinsert(self, evaluator, budget):
+        # Free courses that are unscheduled or break a hard constraint go to their best slot,
+        # the most constrained first
+        hard = ExamScheduleILS.HARD_CONSTRAINT_PENALTY - ExamScheduleILS.LIGHT_CONSTRAINT_PENALTY
+        broken = [c for c in self.free if evaluator.penalties[c] >= hard]
+        for c in sorted(broken, key=lambda c: len(evaluator.graph.neighbours[c]), reverse=True):
+            best_slot, best_delta = None, 0
+            for s in self.fitting_slots(evaluator, c):
+                if s == evaluator.assignment[c]:
+                    continue
+                delta = move_delta(evaluator, (REASSIGN, c, s))
+                budget.spend(1)
+                if delta < best_delta:
+                    best_slot, best_delta = s, delta
+            if best_slot is not None:
+                evaluator.apply_move(c, best_slot)
+
+    def local_search(self, evaluator, budget):
+        # Random moves among the free courses, kept when they do not make the schedule worse
+        free = self.free
+        if not free:
+            return
+        fitting = {c: self.fitting_slots(evaluator, c) for c in free}
+        iterations = ScheduleRepair.MOVES_PER_COURSE * len(free)
+        iteration = 0
+        while evaluator.fitness > 0 and not budget.expired(iteration, iterations):
+            iteration += 1
+            c = random.choice(free)
+            if evaluator.assignment[c] >= 0 and len(free) > 1 and random.random() < ScheduleRepair.SWAP_PROBABILITY:
+                other = random.choice(free)
+                if other == c or evaluator.assignment[other] < 0:
+                    continue
+                move = (SWAP, c, other)
+            elif fitting[c]:
+                move = (REASSIGN, c, random.choice(fitting[c]))
+            else:
+                continue
+            delta = move_delta(evaluator, move)
+            budget.spend(1)
+            if delta <= 0:
+                apply_move(evaluator, move)
@@ -0,0 +1,186 @@
+from array import array
+
+
+class ScheduleEvaluator:
+    # Keeps per-course penalty contributions of one schedule so that moving or swapping
+    # courses only re-scores the moved courses and their conflict neighbourhood.
+    #
+    # For every course it counts the neighbours scheduled in the same slot, in an
+    # overlapping slot, on the same day but apart, and on the previous day; the penalty
+    # of a course only depends on whether those counts are non-zero.
+    def __init__(self, slots, graph, hard_penalty, light_penalty, start_time_factor=0, shared_exam_conflicts=False):
+        self.slots = slots
+        self.graph = graph
+        self.hard_penalty = hard_penalty
+        self.light_penalty = light_penalty
+        self.start_time_factor = start_time_factor
+        # GeneticAlgorithm lets only the first course holding an exam share it without a conflict
+        self.shared_exam_conflicts = shared_exam_conflicts
+
+        self.sizes = array('i', (course.num_of_students for course in graph.courses))
+        self.has_groups = [graph.conflicting(i, i) for i in range(len(graph))]
+        self.self_overlap = [slots.overlap(s, s) for s in range(len(slots))]
+
+        n = len(graph)
+        self.assignment = array('i', [-1] * n)
+        self.same_slot = array('i', [0] * n)
+        self.overlapping = array('i', [0] * n)
+        self.apart = array('i', [0] * n)
+        self.previous_day = array('i', [0] * n)
+        self.penalties = [hard_penalty - light_penalty] * n
+        self.at_slot = [set() for _ in range(len(slots))]
+        self.fitness = n * (hard_penalty - light_penalty)
+        self.num_scheduled = 0
+        self.evaluations = 0  # move and swap deltas computed so far
+
+    def load(self, schedule):
+        slot_of = self.slots.slot_of
+        course_id = self.graph.course_id
+        assignment = array('i', [-1] * len(self.graph))
+        for course, exam in schedule.items():
+            if exam is not None:
+                assignment[course_id(course)] = slot_of(exam)
+        return self.load_assignment(assignment)
+
+    def load_assignment(self, assignment):
+        self.assignment = array('i', assignment)
+        self.at_slot = [set() for _ in range(len(self.slots))]
+        self.num_scheduled = 0
+        for c, s in enumerate(self.assignment):
+            if s >= 0:
+                self.at_slot[s].add(c)
+                self.num_scheduled += 1
+        for c in range(len(self.graph)):
+            self.count_neighbours(c)
+        self.fitness = 0
+        for c in range(len(self.graph)):
+            self.penalties[c] = self.course_penalty(c)
+            self.fitness += self.penalties[c]
+        return self.fitness
+
+    def to_schedule(self):
+        exams = self.slots.exams
+        return {course: (exams[s] if s >= 0 else None) for course, s in zip(self.graph.courses, self.assignment)}
+
+    def count_neighbours(self, c):
+        same_slot = overlapping = apart = previous_day = 0
+        s = self.assignment[c]
+        if s >= 0:
+            slots = self.slots
+            for n in self.graph.neighbours[c]:
+                t = self.assignment[n]
+                if t < 0:
+                    continue
+                if t == s:
+                    same_slot += 1
+                    continue
+                if slots.overlap(t, s):
+                    overlapping += 1
+                elif slots.apart(t, s):
+                    apart += 1
+                elif slots.consecutive(t, s):
+                    previous_day += 1
+        self.same_slot[c] = same_slot
+        self.overlapping[c] = overlapping
+        self.apart[c] = apart
+        self.previous_day[c] = previous_day
+
+    def update_neighbour(self, n, s, step):
+        # Course n gains (step=1) or loses (step=-1) a neighbour scheduled in slot s
+        t = self.assignment[n]
+        if t < 0:
+            return
+        slots = self.slots
+        if t == s:
+            self.same_slot[n] += step
+        elif slots.overlap(s, t):
+            self.overlapping[n] += step
+        elif slots.apart(s, t):
+            self.apart[n] += step
+        elif slots.consecutive(s, t):
+            self.previous_day[n] += step
+
+    def has_conflict(self, c):
+        if self.overlapping[c]:
+            return True
+        s = self.assignment[c]
+        if not self.self_overlap[s]:
+            return False
+        if not self.shared_exam_conflicts:
+            return False
+        if self.same_slot[c] == 0 and not self.has_groups[c]:
+            return False
+        first = min(self.at_slot[s])
+        if first != c:
+            if self.has_groups[c]:
+                return True
+            return self.same_slot[c] - self.graph.conflicting(c, first) > 0
+        return self.same_slot[c] > 0
+
+    def course_penalty(self, c):
+        s = self.assignment[c]
+        if s < 0:
+            return self.hard_penalty - self.light_penalty
+
+        penalty = self.start_time_factor * self.slots.start[s]
+        if self.slots.capacity[s] < self.sizes[c]:
+            penalty += self.hard_penalty
+        if self.has_conflict(c):
+            penalty += self.hard_penalty
+        if self.previous_day[c]:
+            penalty += self.light_penalty
+        if self.apart[c]:
+            penalty += self.light_penalty * 2
+        return penalty
+
+    def apply_move(self, c, s):
+        old = self.assignment[c]
+        if old == s:
+            return self.fitness
+
+        neighbours = self.graph.neighbours[c]
+        affected = set(neighbours)
+        affected.add(c)
+        if old >= 0:
+            for n in neighbours:
+                self.update_neighbour(n, old, -1)
+            self.at_slot[old].discard(c)
+            if self.shared_exam_conflicts:
+                affected.update(self.at_slot[old])
+        self.assignment[c] = s
+        self.num_scheduled += (s >= 0) - (old >= 0)
+        if s >= 0:
+            self.at_slot[s].add(c)
+            for n in neighbours:
+                self.update_neighbour(n, s, 1)
+            if self.shared_exam_conflicts:
+                affected.update(self.at_slot[s])
+        self.count_neighbours(c)
+
+        for x in affected:
+            penalty = self.course_penalty(x)
+            self.fitness += penalty - self.penalties[x]
+            self.penalties[x] = penalty
+        return self.fitness
+
+    def apply_swap(self, c1, c2):
+        s1 = self.assignment[c1]
+        self.apply_move(c1, self.assignment[c2])
+        return self.apply_move(c2, s1)
+
+    def move_delta(self, c, s):
+        self.evaluations += 1
+        old = self.assignment[c]
+        before = self.fitness
+        after = self.apply_move(c, s)
+        self.apply_move(c, old)
+        return after - before
+
+    def swap_delta(self, c1, c2):
+        self.evaluations += 1
+        s1, s2 = self.assignment[c1], self.assignment[c2]
+        before = self.fitness
+        after = self.apply_swap(c1, c2)
+        self.apply_move(c1, s1)
+        self.apply_move(c2, s2)
+        return after - before
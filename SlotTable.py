@@ -0,0 +1,54 @@
+from array import array
+
+
+def parse_time(time_string):
+    hours, minutes = time_string.split(":")
+    hours = int(hours) if hours else 0
+    minutes = int(minutes) if minutes else 0
+    return hours * 60 + minutes
+
+
+def parse_duration(duration_string):
+    hours, minutes = duration_string.split("h")
+    hours = int(hours.strip()) if hours else 0
+    minutes = int(minutes.strip().replace("m", "")) if minutes else 0
+    return int(hours) * 60 + int(minutes)
+
+
+class SlotTable:
+    # Exam slots compiled once into flat integer columns, indexed by position in the exams list
+    def __init__(self, exams):
+        self.exams = exams
+        self.index = {}
+        self.start = array('i')
+        self.end = array('i')
+        self.day = array('i')
+        self.capacity = array('i')
+
+        for i, exam in enumerate(exams):
+            self.index.setdefault(id(exam), i)
+            self.start.append(exam.start)  # parsed once by Model.Exam
+            self.end.append(exam.end)
+            self.day.append(exam.day)
+            self.capacity.append(exam.capacity)
+
+    def __len__(self):
+        return len(self.exams)
+
+    def slot_of(self, exam):
+        return self.index[id(exam)]
+
+    def is_finished(self, i, j):
+        return self.end[i] <= self.start[j]
+
+    def same_day(self, i, j):
+        return self.day[i] == self.day[j]
+
+    def overlap(self, i, j):
+        return self.day[i] == self.day[j] and self.end[i] > self.start[j] and self.end[j] > self.start[i]
+
+    def apart(self, i, j):  # same day, but one exam finishes before the other starts
+        return self.day[i] == self.day[j] and (self.end[i] <= self.start[j] or self.end[j] <= self.start[i])
+
+    def consecutive(self, i, j):  # slot j is on the day after slot i
+        return self.day[j] - self.day[i] == 1
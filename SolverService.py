@@ -0,0 +1,331 @@
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import pickle
+from datetime import date
+
+import Anytime
+from InstanceLoader import InstanceUnpickler, MODEL_CLASSES, content_hash
+from ConflictGraph import forget_conflict_graph
+from IteratedLocalSearch import ExamScheduleILS
+from GeneticAlgoritm import GeneticAlgorithm
+from TabuSearch import TabuSearch
+
+SOLVERS = ('ils', 'ga', 'tabu', 'annealing', 'gurobi')
+WORKERS = 2  # solver processes, jobs beyond these wait in the queue
+QUEUE_SIZE = 64  # queued jobs before new submissions are refused
+MAX_FINISHED_JOBS = 256  # finished jobs kept in memory, older ones are answered from the result cache
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.service-cache')
+HOST = '127.0.0.1'
+PORT = 8765
+MAX_BODY = 256 * 1024 * 1024
+
+
+class RestrictedUnpickler(InstanceUnpickler):
+    # Payloads come from the socket, so only the classes an instance consists of may be loaded
+    def find_class(self, module, name):
+        if module in ('__main__', 'Model') and name in MODEL_CLASSES:
+            return MODEL_CLASSES[name]
+        if (module, name) == ('datetime', 'date'):
+            return date
+        raise pickle.UnpicklingError(f"{module}.{name} is not part of an instance")
+
+
+class Job:
+    def __init__(self, key, payload, params):
+        self.key = key
+        self.payload = payload
+        self.params = params
+        self.status = 'queued'  # queued, running, done or failed
+        self.submitted = time.time()
+        self.progress = None  # the latest incumbent: fitness, elapsed and evaluations
+        self.result = None
+        self.error = None
+
+    def as_dict(self, with_result=False):
+        job = {'job': self.key, 'status': self.status, 'params': self.params, 'progress': self.progress}
+        if self.error is not None:
+            job['error'] = self.error
+        if with_result:
+            job['result'] = self.result
+        return job
+
+
+def parse_params(query):
+    # Everything that changes the answer for the same instance, and so goes into the cache key
+    values = {name: items[-1] for name, items in parse_qs(query).items()}
+    solver = values.get('solver', 'ils')
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver: {solver}")
+    params = {'solver': solver, 'seed': int(values.get('seed', 0))}
+    if 'time_limit' in values:
+        params['time_limit'] = float(values['time_limit'])
+    if 'max_evaluations' in values:
+        params['max_evaluations'] = int(values['max_evaluations'])
+    return params
+
+
+def job_key(payload, params):
+    return content_hash(content_hash(payload).encode() + json.dumps(params, sort_keys=True).encode())
+
+
+class ResultCache:
+    # One JSON file per finished job, so results outlive the service
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        try:
+            with open(self.path(key)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, result):
+        temporary = self.path(key) + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(result, file)
+        os.replace(temporary, self.path(key))
+
+
+class SolverService:
+    def __init__(self, workers=WORKERS, queue_size=QUEUE_SIZE, cache_dir=CACHE_DIR, max_finished_jobs=MAX_FINISHED_JOBS):
+        self.workers = workers
+        self.max_finished_jobs = max_finished_jobs
+        self.cache = ResultCache(cache_dir)
+        self.jobs = {}
+        self.queue = asyncio.Queue(queue_size)
+        # Solver processes report every improvement here; a thread hands them to the event loop
+        self.progress = multiprocessing.Queue()
+        self.pool = ProcessPoolExecutor(workers, initializer=init_solver_worker, initargs=(self.progress,))
+        self.loop = None
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        threading.Thread(target=self.read_progress, daemon=True).start()
+        self.dispatchers = [asyncio.create_task(self.dispatch()) for _ in range(self.workers)]
+
+    def close(self):
+        self.progress.put(None)
+        self.pool.shutdown(cancel_futures=True)
+
+    def read_progress(self):
+        while True:
+            update = self.progress.get()
+            if update is None:
+                return
+            key, progress = update
+            self.loop.call_soon_threadsafe(self.update_progress, key, progress)
+
+    def update_progress(self, key, progress):
+        job = self.jobs.get(key)
+        if job is not None and job.status == 'running':
+            job.progress = progress
+
+    def submit(self, payload, params):
+        # Returns the job for this instance and parameters, finished at once when the result is cached
+        key = job_key(payload, params)
+        job = self.jobs.get(key)
+        if job is not None and job.status != 'failed':
+            return job
+
+        job = Job(key, payload, params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            job.status = 'done'
+            job.result = cached
+            job.progress = cached['progress']
+            job.payload = None
+        else:
+            self.queue.put_nowait(job)  # raises asyncio.QueueFull when the service is saturated
+        self.jobs.pop(key, None)
+        self.jobs[key] = job
+        self.prune_jobs()
+        return job
+
+    def prune_jobs(self):
+        # Forgets the oldest finished jobs; done ones stay available through the result cache
+        finished = [key for key, job in self.jobs.items() if job.status in ('done', 'failed')]
+        for key in finished[:len(finished) - self.max_finished_jobs]:
+            del self.jobs[key]
+
+    async def dispatch(self):
+        while True:
+            job = await self.queue.get()
+            job.status = 'running'
+            try:
+                result = await self.loop.run_in_executor(self.pool, run_job, job.key, job.payload, job.params)
+            except Exception as error:
+                job.status = 'failed'
+                job.error = f"{type(error).__name__}: {error}"
+            else:
+                job.result = result
+                job.progress = result['progress']
+                job.status = 'done'
+                self.cache.put(job.key, result)
+            finally:
+                job.payload = None
+                self.queue.task_done()
+                self.prune_jobs()
+
+    async def handle(self, reader, writer):
+        try:
+            status, body = await self.respond(reader)
+        except Exception as error:
+            status, body = 400, {'error': f"{type(error).__name__}: {error}"}
+        data = json.dumps(body).encode()
+        writer.write(f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+        await writer.drain()
+        writer.close()
+
+    async def respond(self, reader):
+        method, target, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+        if length > MAX_BODY:
+            return 413, {'error': 'instance too large'}
+        body = await reader.readexactly(length) if length else b''
+
+        url = urlsplit(target)
+        path = url.path.rstrip('/').split('/')[1:]
+        if method == 'POST' and path == ['jobs']:
+            # The body is an instance pickle, the same bytes as a file in Instance/
+            try:
+                job = self.submit(body, parse_params(url.query))
+            except asyncio.QueueFull:
+                return 503, {'error': 'queue full'}
+            return 202 if job.status != 'done' else 200, job.as_dict()
+        if method == 'GET' and path == ['jobs']:
+            return 200, {'jobs': [job.as_dict() for job in self.jobs.values()], 'queued': self.queue.qsize()}
+        if method == 'GET' and len(path) in (2, 3) and path[0] == 'jobs':
+            job = self.jobs.get(path[1])
+            if job is None:
+                cached = self.cache.get(path[1])
+                if cached is None:
+                    return 404, {'error': 'unknown job'}
+                return 200, {'job': path[1], 'status': 'done', 'progress': cached['progress'], 'result': cached}
+            if len(path) == 3 and path[2] == 'result':
+                return (200 if job.status == 'done' else 202), job.as_dict(with_result=True)
+            return 200, job.as_dict()
+        return 404, {'error': 'not found'}
+
+
+STATUS_TEXT = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large', 503: 'Service Unavailable'}
+
+worker_progress = None
+
+
+def init_solver_worker(progress):
+    global worker_progress
+    worker_progress = progress
+
+
+def report(key, fitness, elapsed, evaluations):
+    progress = {'fitness': fitness, 'elapsed': elapsed, 'evaluations': evaluations}
+    if worker_progress is not None:
+        worker_progress.put((key, progress))
+    return progress
+
+
+def run_job(key, payload, params):
+    data = RestrictedUnpickler(io.BytesIO(payload)).load()
+    exams, courses, students = data['exams'], data['courses'], data['students']
+    random.seed(params['seed'])
+    solver = params['solver']
+    progress = None
+
+    mode = TabuSearch.MODE
+    try:
+        if solver == 'gurobi':
+            from Gurobi import solve_exam_scheduling
+            start = time.perf_counter()
+            solutions = [0]
+
+            def on_solution(schedule, objective, runtime):
+                nonlocal progress
+                solutions[0] += 1
+                progress = report(key, objective, runtime, solutions[0])
+
+            schedule = solve_exam_scheduling(courses, exams, students, time_limit=params.get('time_limit'), threads=1, on_solution=on_solution) or {}
+            if progress is None:
+                progress = report(key, None, time.perf_counter() - start, solutions[0])
+        else:
+            if solver == 'ils':
+                algorithm = ExamScheduleILS(exams, courses, students)
+            elif solver == 'ga':
+                algorithm = GeneticAlgorithm(exams, courses, students)
+            else:
+                TabuSearch.MODE = solver
+                algorithm = TabuSearch(exams, courses, students)
+            schedule = {}
+            for incumbent in Anytime.incumbents(algorithm, params.get('time_limit'), params.get('max_evaluations')):
+                schedule = incumbent.schedule
+                progress = report(key, incumbent.fitness, incumbent.elapsed, incumbent.evaluations)
+    finally:
+        # A worker process runs many jobs, neither this job's conflict graph nor its mode may outlive it
+        TabuSearch.MODE = mode
+        forget_conflict_graph(courses)
+
+    index = {id(exam): s for s, exam in enumerate(exams)}
+    rows = []
+    assignment = []
+    for course in courses:
+        exam = schedule.get(course)
+        assignment.append(-1 if exam is None else index[id(exam)])
+        rows.append({'course': course.name, 'date': None if exam is None else exam.date.isoformat(),
+                     'start_time': None if exam is None else exam.start_time,
+                     'duration': None if exam is None else exam.duration})
+    return {'params': params, 'progress': progress, 'fitness': progress['fitness'], 'assignment': assignment, 'schedule': rows}
+
+
+async def serve(host=HOST, port=PORT, unix_path=None, workers=WORKERS):
+    service = SolverService(workers)
+    await service.start()
+    if unix_path is not None:
+        server = await asyncio.start_unix_server(service.handle, unix_path)
+        print(f"Solver service listening on {unix_path}")
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+        print(f"Solver service listening on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local exam scheduling service: POST an instance pickle to /jobs')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--unix', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+import math
+import random
+
+import numpy as np
+
+from SlotTable import SlotTable
+from ConflictGraph import get_conflict_graph
+from ScheduleEvaluator import ScheduleEvaluator
+from Neighbourhood import SWAP, REASSIGN, move_delta, apply_move
+from Instrumentation import Stats, Trace, instrument, one
+from Construction import Construction
+from Anytime import Budget
+
+
+class TabuSearch:
+    # Tabu search and simulated annealing over the same penalties as ExamScheduleILS, so the
+    # fitness of their schedules can be compared directly
+    HARD_CONSTRAINT_PENALTY = 100000
+    LIGHT_CONSTRAINT_PENALTY = 100
+    START_TIME_FACTOR = 0
+
+    MODE = 'tabu'  # 'tabu' or 'annealing'
+    SWAP_PROBABILITY = 0.3  # share of sampled moves that swap two courses instead of reassigning one
+    FOCUS = 0.8  # probability that a sampled move starts from a course that still carries a penalty
+    FOCUS_ATTEMPTS = 20  # random courses tried before settling for an unpenalized one
+
+    TABU_ITERATIONS = 500
+    CANDIDATES = 40  # moves sampled per tabu iteration, the best allowed one is made
+    TABU_TENURE = 10  # iterations a course may not return to a slot it left
+    TABU_TENURE_SPREAD = 5  # plus up to this many more, drawn at random, so cycles are harder to fall into
+    MAX_WORSENING = 0.5  # share of HARD_CONSTRAINT_PENALTY a move may add; a sampled neighbourhood rarely offers a way back from a new hard violation
+    RETURN_AFTER = 200  # iterations without a new best before the search goes back to the best schedule
+
+    ANNEALING_ITERATIONS = 20000
+    INITIAL_TEMPERATURE = 200.0
+    FINAL_TEMPERATURE = 1.0
+    COOLING = 'geometric'  # 'geometric', 'linear' or 'logarithmic' over the share of the budget spent
+    TRACE_INTERVAL = 100  # annealing iterations between trace events
+
+    INSTRUMENTED_METHODS = ('find_initial_schedule', 'sample_move')
+
+    def __init__(self, exams, courses, students):
+        self.exams = exams
+        self.courses = courses
+        self.students = students
+        self.slots = SlotTable(exams)
+        self.graph = get_conflict_graph(courses)
+        self.construction = Construction(self.slots, self.graph)
+        self.stats = None
+        self.trace = None
+        self.penalties = None
+        self.refresh_penalties()
+
+        # Slots by decreasing capacity: the first fitting[c] of them can hold course c
+        self.by_capacity = np.argsort(-np.array(self.slots.capacity), kind='stable').tolist()
+        self.fitting = list(self.construction.fitting)
+
+    def refresh_penalties(self):
+        penalties = (TabuSearch.HARD_CONSTRAINT_PENALTY, TabuSearch.LIGHT_CONSTRAINT_PENALTY, TabuSearch.START_TIME_FACTOR)
+        if penalties != self.penalties:
+            self.penalties = penalties
+            self.evaluator = ScheduleEvaluator(self.slots, self.graph, *penalties)
+            if self.stats is not None:
+                self.instrument_evaluator()
+
+    def enable_instrumentation(self, trace_path=None):
+        self.stats = Stats()
+        for name in TabuSearch.INSTRUMENTED_METHODS:
+            instrument(self, name, self.stats)
+        self.instrument_evaluator()
+        self.trace = Trace(trace_path, self.stats) if trace_path is not None else None
+        return self.stats
+
+    def instrument_evaluator(self):
+        instrument(self.evaluator, 'move_delta', self.stats, one)
+        instrument(self.evaluator, 'swap_delta', self.stats, one)
+
+    def find_schedule(self):
+        best_schedule = None
+        for best_schedule, _ in self.anytime(Budget()):
+            pass
+        return best_schedule
+
+    def anytime(self, budget):
+        # Yields (schedule, fitness) for the initial schedule and every improvement until the budget
+        # is spent or a schedule without any penalty is found
+        self.refresh_penalties()
+        best_schedule = self.find_initial_schedule()
+        best_fitness = self.evaluator.load(best_schedule)
+        budget.spend(1)
+        yield best_schedule, best_fitness
+
+        if TabuSearch.MODE == 'tabu':
+            yield from self.tabu_search(budget, best_fitness)
+        elif TabuSearch.MODE == 'annealing':
+            yield from self.annealing(budget, best_fitness)
+        else:
+            raise ValueError(f"Unknown mode: {TabuSearch.MODE}")
+
+    def find_initial_schedule(self):
+        assignment = self.construction.construct()
+        return {course: (self.exams[slot] if slot >= 0 else None) for course, slot in zip(self.courses, assignment)}
+
+    def tabu_search(self, budget, best_fitness):
+        evaluator = self.evaluator
+        max_worsening = TabuSearch.HARD_CONSTRAINT_PENALTY * TabuSearch.MAX_WORSENING
+        tabu_until = {}  # (course, slot) -> first iteration the course may be put back into the slot
+        best_assignment = evaluator.assignment[:]
+        iteration = 0
+        last_improvement = 0
+
+        while best_fitness > 0 and not budget.expired(iteration, TabuSearch.TABU_ITERATIONS):
+            evaluations = evaluator.evaluations
+            chosen, chosen_delta = None, None
+            for _ in range(TabuSearch.CANDIDATES):
+                move = self.sample_move()
+                if move is None:
+                    continue
+                delta = move_delta(evaluator, move)
+                if chosen is not None and delta >= chosen_delta:
+                    continue
+                # Aspiration: a tabu move is still allowed when it beats the best schedule found so far
+                if self.is_tabu(move, tabu_until, iteration) and evaluator.fitness + delta >= best_fitness:
+                    continue
+                chosen, chosen_delta = move, delta
+            budget.spend(evaluator.evaluations - evaluations)
+
+            if chosen is not None and chosen_delta <= max_worsening:
+                tenure = iteration + TabuSearch.TABU_TENURE + random.randint(0, TabuSearch.TABU_TENURE_SPREAD)
+                for course in self.moved_courses(chosen):
+                    tabu_until[course, evaluator.assignment[course]] = tenure
+                apply_move(evaluator, chosen)
+
+                if evaluator.fitness < best_fitness:
+                    best_fitness = evaluator.fitness
+                    best_assignment = evaluator.assignment[:]
+                    last_improvement = iteration
+                    yield evaluator.to_schedule(), best_fitness
+
+            if iteration - last_improvement >= TabuSearch.RETURN_AFTER:
+                evaluator.load_assignment(best_assignment)
+                tabu_until.clear()
+                last_improvement = iteration
+
+            if self.trace is not None:
+                self.trace.event(iteration=iteration, fitness=best_fitness, current_fitness=evaluator.fitness)
+            iteration += 1
+
+    def is_tabu(self, move, tabu_until, iteration):
+        assignment = self.evaluator.assignment
+        if move[0] == SWAP:
+            return (tabu_until.get((move[1], assignment[move[2]]), 0) > iteration or
+                    tabu_until.get((move[2], assignment[move[1]]), 0) > iteration)
+        return tabu_until.get((move[1], move[2]), 0) > iteration
+
+    def moved_courses(self, move):
+        if move[0] == SWAP:
+            return move[1], move[2]
+        return move[1],
+
+    def annealing(self, budget, best_fitness):
+        evaluator = self.evaluator
+        iteration = 0
+
+        while best_fitness > 0 and not budget.expired(iteration, TabuSearch.ANNEALING_ITERATIONS):
+            temperature = self.temperature(budget.progress(iteration, TabuSearch.ANNEALING_ITERATIONS))
+            move = self.sample_move()
+            if move is not None:
+                delta = move_delta(evaluator, move)
+                budget.spend(1)
+                if delta <= 0 or random.random() < math.exp(-delta / temperature):
+                    apply_move(evaluator, move)
+                    if evaluator.fitness < best_fitness:
+                        best_fitness = evaluator.fitness
+                        yield evaluator.to_schedule(), best_fitness
+
+            if self.trace is not None and iteration % TabuSearch.TRACE_INTERVAL == 0:
+                self.trace.event(iteration=iteration, fitness=best_fitness, current_fitness=evaluator.fitness, temperature=temperature)
+            iteration += 1
+
+    def temperature(self, progress):
+        start, end = TabuSearch.INITIAL_TEMPERATURE, TabuSearch.FINAL_TEMPERATURE
+        if TabuSearch.COOLING == 'geometric':
+            return start * (end / start) ** progress
+        if TabuSearch.COOLING == 'linear':
+            return start + (end - start) * progress
+        if TabuSearch.COOLING == 'logarithmic':
+            return start / (1 + (start / end - 1) * math.log1p(progress * (math.e - 1)))
+        raise ValueError(f"Unknown cooling schedule: {TabuSearch.COOLING}")
+
+    def sample_move(self):
+        # A course that still costs something, most of the time, reassigned to a slot big enough
+        # for it or swapped with another scheduled course
+        evaluator = self.evaluator
+        assignment = evaluator.assignment
+        num_courses = len(assignment)
+        if not num_courses:
+            return None
+
+        course = random.randrange(num_courses)
+        if random.random() < TabuSearch.FOCUS:
+            for _ in range(TabuSearch.FOCUS_ATTEMPTS):
+                if evaluator.penalties[course] > 0:
+                    break
+                course = random.randrange(num_courses)
+
+        if assignment[course] >= 0 and evaluator.num_scheduled > 1 and random.random() < TabuSearch.SWAP_PROBABILITY:
+            other = random.randrange(num_courses)
+            while other == course or assignment[other] < 0:
+                other = random.randrange(num_courses)
+            if assignment[other] != assignment[course]:
+                return SWAP, course, other
+
+        fitting = self.fitting[course]
+        slot = self.by_capacity[random.randrange(fitting)] if fitting else random.randrange(len(self.slots))
+        if slot == assignment[course]:
+            return None
+        return REASSIGN, course, slot
+